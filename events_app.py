@@ -31,14 +31,34 @@
 
 # ----- Imports & Setup -----
 import os
+import argparse
+import asyncio
+import atexit
+import bisect
 import math
+import hashlib
+import inspect
+import json
 import re
-from datetime import date, datetime
-from zoneinfo import ZoneInfo
+import tempfile
+import unicodedata
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
 import gradio as gr
+import uvicorn
+from fastapi import FastAPI, Request, Response
 from dotenv import load_dotenv
-from supabase import create_client
+from supabase import AsyncClient, acreate_client, create_client
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+from events_app_ics_helper import (
+    TZ_BERLIN, aiter_ics_calendar, build_ics_event, ics_filename_for_event, iter_ics_calendar,
+    iter_ics_vevents, slugify, vevent_to_event,
+)
 
 # robust relativ zum Skript statt zum Working-Dir
 BASE_DIR = Path(__file__).resolve().parent
@@ -56,7 +76,21 @@ __APP_VERSION__ = " © 2025 Karl-Heinz Turban. Alle Rechte vorbehalten. Logos/Ma
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")   # nur für den ICS-Import (Schreibrechte)
+
+# Async-Client: Handler laufen als Coroutinen im Event-Loop von Gradio,
+# gleichzeitige Besucher warten dort auf HTTP statt Worker-Threads zu blockieren.
+_sb_client: AsyncClient | None = None
+_sb_lock = asyncio.Lock()
+
+async def get_supabase() -> AsyncClient:
+    """Async-Supabase-Client (lazy, einmal pro Prozess im laufenden Event-Loop erzeugt)."""
+    global _sb_client
+    if _sb_client is None:
+        async with _sb_lock:
+            if _sb_client is None:
+                _sb_client = await acreate_client(SUPABASE_URL, SUPABASE_KEY)
+    return _sb_client
 
 # ----- Konstanten -----
 EVENTS_PER_PAGE = 6
@@ -65,6 +99,62 @@ APP_TITLE = "Events & Termine der Alternative für Deutschland  • Ein Service
 BROWSER_TITLE = "Events & Termine – AfD"
 LOGO_PATH = "assets/logo_160_80.png"
 COUNTER_NAME = "events.pageview"  # bei Bedarf variabel machen 
+COUNTER_ALLOWED_HOSTS = ("events.turban-direkt.de", "localhost", "127.0.0.1")  # nur hier zählen
+COUNTER_FLUSH_INTERVAL = float(os.getenv("COUNTER_FLUSH_INTERVAL", "15"))   # Sekunden zwischen Batch-Writes
+COUNTER_FLUSH_THRESHOLD = int(os.getenv("COUNTER_FLUSH_THRESHOLD", "50"))   # Pageviews, ab denen sofort geschrieben wird
+COUNTER_SNAPSHOT_MAX_AGE = float(os.getenv("COUNTER_SNAPSHOT_MAX_AGE", "20"))  # Sekunden, danach Refresh im Hintergrund
+COUNTER_SNAPSHOT_COLD_WAIT = 1.0   # Sekunden, die der allererste Aufruf höchstens auf den Snapshot wartet
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))     # Sekunden
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "256"))    # Einträge (LRU)
+LOCAL_SEARCH = os.getenv("LOCAL_SEARCH", "0") == "1"              # Suche im lokalen Index statt ILIKE
+LOCAL_INDEX_REFRESH = float(os.getenv("LOCAL_INDEX_REFRESH", "300"))  # Sekunden bis zum Neuaufbau
+LOCAL_MATCH_CACHE_SIZE = int(os.getenv("LOCAL_MATCH_CACHE_SIZE", "1024"))  # Query-Wörter je Snapshot (LRU)
+SEARCH_DEBOUNCE_MS = int(os.getenv("SEARCH_DEBOUNCE_MS", "350"))  # Ruhezeit Live-Suche, 0 = aus
+EVENTS_SUMMARY_MODE = os.getenv("EVENTS_SUMMARY_MODE", "0") == "1"  # Beschreibung serverseitig kürzen
+PAGINATION_MODE = os.getenv("PAGINATION_MODE", "offset")         # "offset" | "keyset"
+SEARCH_FTS = os.getenv("SEARCH_FTS", "1") == "1"                 # Volltext-RPC search_events statt ILIKE
+SEARCH_FTS_RETRY = float(os.getenv("SEARCH_FTS_RETRY", "600"))    # Sekunden ILIKE, wenn die RPC fehlt
+FACET_CACHE_TTL = float(os.getenv("FACET_CACHE_TTL", "300"))     # Sekunden, Facetten-Zählung (spätestens bis Mitternacht)
+FACET_MAX_VALUES = int(os.getenv("FACET_MAX_VALUES", "50"))       # Werte je Facetten-Dropdown (häufigste zuerst)
+COUNT_MODE = os.getenv("COUNT_MODE", "exact").strip().lower()   # "exact" | "estimated" | "planned" | "none"
+if COUNT_MODE not in ("exact", "estimated", "planned", "none"):
+    COUNT_MODE = "exact"
+COUNT_ESTIMATE_THRESHOLD = int(os.getenv("COUNT_ESTIMATE_THRESHOLD", "1000"))  # = db-max-rows: darunter zählt "estimated" exakt
+PAGE_WINDOW_SIZE = int(os.getenv("PAGE_WINDOW_SIZE", "5"))        # gerenderte Seiten je Session (Zurück ohne DB)
+PAGE_PREFETCH = os.getenv("PAGE_PREFETCH", "1") == "1"           # Folgeseite im Hintergrund vorladen
+TIPP_CACHE_TTL = float(os.getenv("TIPP_CACHE_TTL", "600"))       # Sekunden, spätestens bis Mitternacht (Berlin)
+ICS_EXPORT_CHUNK = int(os.getenv("ICS_EXPORT_CHUNK", "500"))     # Zeilen pro DB-Abfrage beim Kalender-Export
+ICS_EXPORT_MAX_AGE = int(os.getenv("ICS_EXPORT_MAX_AGE", "900"))  # Sekunden, danach werden Export-Dateien gelöscht
+ICS_EXPORT_DIR = Path(tempfile.gettempdir()) / "kalli-ics-export"  # ein Verzeichnis für alle Exporte
+FEED_RECHECK_SECONDS = float(os.getenv("FEED_RECHECK_SECONDS", "300"))  # so lange gilt der Feed ohne DB-Abfrage
+FEED_PAST_DAYS = int(os.getenv("FEED_PAST_DAYS", "30"))           # Feed enthält Termine ab heute minus N Tage
+ICS_CACHE_SIZE = int(os.getenv("ICS_CACHE_SIZE", "512"))          # vorgerenderte Einzel-ICS (LRU)
+ICS_CACHE_TTL = float(os.getenv("ICS_CACHE_TTL", "900"))          # Sekunden, auch Cache-Control max-age
+CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", "2048"))       # gerenderte Event-Karten (LRU)
+PAGE_MD_CACHE_SIZE = int(os.getenv("PAGE_MD_CACHE_SIZE", "256"))  # fertige Seiten-Markdowns (LRU)
+ICS_IMPORT_BATCH = int(os.getenv("ICS_IMPORT_BATCH", "500"))     # Zeilen pro upsert beim ICS-Import
+BASE_PATH = os.getenv("BASE_PATH", "")                            # Präfix für Links auf eigene Routen (z. B. "/events")
+
+# Parallelität je Handler (Gradio concurrency_limit), "none" = unbegrenzt
+def _concurrency(env: str, default: str):
+    v = os.getenv(env, default).strip().lower()
+    return None if v == "none" else int(v)
+
+CONCURRENCY_SEARCH = _concurrency("CONCURRENCY_SEARCH", "16")   # do_search (Filter, Initial Load)
+CONCURRENCY_LIVE = _concurrency("CONCURRENCY_LIVE", "none")     # do_search_live (wartet meist nur)
+CONCURRENCY_NAV = _concurrency("CONCURRENCY_NAV", "16")         # go_back / go_next / clear
+
+# Spalten, die format_event_card und die ICS-Helfer tatsächlich lesen (statt select("*"))
+EVENT_CARD_COLUMNS = (
+    "id", "titel", "datum", "uhrzeit", "dauer", "ort", "kategorie", "beschreibung",
+    "event_level", "link", "pdf_url",
+    "requires_registration", "email_contact", "show_location", "email_questions",
+    "updated_at",   # Version für Karten-/ICS-Cache (supabase/migrations/*_events_updated_at.sql)
+)
+# Zusätzlich durchsuchte Spalten (lokaler Index)
+EVENT_SEARCH_COLUMNS = ("status", "team")
+# Facetten-Filter (exakter Vergleich, siehe supabase/migrations/*_events_facets.sql)
+FACET_COLUMNS = ("kategorie", "ort", "team", "event_level")
 
 DISCLAIMER_HTML = """
 <div class="kalli-disclaimer">
@@ -77,10 +167,16 @@ Wenn du das nicht möchtest, nutze die App bitte nicht weiter.
 # ----- Zeit / Datum -----
 def today_berlin() -> str:
     try:
-        return datetime.now(ZoneInfo("Europe/Berlin")).date().isoformat()
+        return datetime.now(TZ_BERLIN).date().isoformat()
     except Exception:
         return date.today().isoformat()
 
+def seconds_until_berlin_midnight() -> float:
+    """Sekunden bis zum nächsten Tageswechsel in Berlin (mind. 1)."""
+    now = datetime.now(TZ_BERLIN)
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+    return max(1.0, (midnight - now).total_seconds())
+
 # ----- CSS -----
 CUSTOM_CSS = """
 #footer, footer { display:none !important; }
@@ -113,6 +209,7 @@ button[aria-label="Fullscreen"], button[title="Fullscreen"] { display:none !impo
   /* Sicherheitsnetz gegen Tooltips/Popover/Portals */
   [role="tooltip"], [data-testid="tooltip"], .tooltip, .popover { display: none !important; }
   #btn-clear { display: none !important; }
+  #ics-export { display: none !important; }
 }
 """
 CUSTOM_CSS += """
@@ -140,6 +237,118 @@ body.dark .tipp-title, html.dark .tipp-title {
 }
 """
 
+# ----- TTL/LRU-Cache -----
+MISSING = object()
+
+class TTLCache:
+    """Kleiner thread-sicherer LRU-Cache mit Ablaufzeit und Hit/Miss-Zählern."""
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()   # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Liefert den Wert oder MISSING (abgelaufen/unbekannt)."""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def peek(self, key):
+        """Wie get, aber ohne LRU-Bewegung und ohne Hit/Miss zu zählen."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= time.monotonic():
+                return MISSING
+            return item[1]
+
+    def __contains__(self, key) -> bool:
+        """Vorhanden und nicht abgelaufen (ohne LRU-Bewegung und ohne Hit/Miss zu zählen)."""
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > time.monotonic()
+
+    def invalidate(self, key=MISSING):
+        """Einen Eintrag oder (ohne key) den ganzen Cache verwerfen."""
+        with self._lock:
+            if key is MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data), "maxsize": self.maxsize,
+                "ttl": self.ttl if math.isfinite(self.ttl) else None,
+                "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+class SingleFlight:
+    """Request-Coalescing: gleichzeitige Aufrufe mit gleichem Schlüssel teilen sich
+    einen laufenden Task und dessen Ergebnis (bzw. Fehler). Lebt im Event-Loop,
+    daher ohne Lock. Nach Abschluss fragt der nächste Aufruf wieder neu
+    (das Ergebnis hält der jeweilige TTLCache).
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.shared = 0
+        self._tasks: dict = {}
+
+    def start(self, key, factory) -> asyncio.Task:
+        """Laufenden Task zum Schlüssel liefern oder factory() als neuen starten."""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.shared += 1
+            return task
+        task = asyncio.get_running_loop().create_task(factory())
+        self._tasks[key] = task
+        self.started += 1
+        task.add_done_callback(lambda t: self._done(key, t))
+        return task
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()   # gilt als abgeholt, auch wenn niemand (mehr) wartet
+
+    async def run(self, key, factory):
+        # shield: bricht ein Wartender ab (Tab zu), läuft die Abfrage für die anderen weiter
+        return await asyncio.shield(self.start(key, factory))
+
+    def __contains__(self, key) -> bool:
+        return key in self._tasks
+
+    def stats(self) -> dict:
+        total = self.started + self.shared
+        return {
+            "in_flight": len(self._tasks), "started": self.started, "shared": self.shared,
+            "share_rate": round(self.shared / total, 3) if total else 0.0,
+        }
+
 # =============================
 # BLOCK 2 — Tipp-Bereich & Event-Card Rendering
 # =============================
@@ -153,27 +362,185 @@ def _public_url(res):
     return ""
 
 # ----- Tipp laden -----
-def load_tipp(sb):
+async def _query_tipp(sb, today: str):
+    data = (await sb.table("site_news_tipp").select("*")
+            .eq("published", True)
+            .lte("valid_from", today)
+            .or_(f"valid_to.gte.{today},valid_to.is.null")
+            .order("valid_from", desc=True)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()).data
+    return data[0] if data else None
+
+# ----- Tipp-Cache -----
+# Der Tipp ändert sich nur, wenn die Redaktion veröffentlicht oder der Tag wechselt:
+# gerendertes Markdown + Chip-HTML werden prozessweit je Berlin-Datum gehalten.
+# Einzige Invalidierung ist der Ablauf (TIPP_CACHE_TTL bzw. Mitternacht) – ein
+# neu veröffentlichter Tipp erscheint also spätestens nach TIPP_CACHE_TTL.
+tipp_cache = TTLCache(maxsize=4, ttl=TIPP_CACHE_TTL)
+tipp_flight = SingleFlight()   # Cache-Miss um Mitternacht: eine Abfrage für alle Besucher
+public_url_cache = TTLCache(maxsize=256, ttl=float("inf"))   # (bucket, path) -> URL
+
+def format_tipp_md(row) -> str:
+    return f"""### <span class="tipp-badge">Mein Tipp</span><span class="tipp-title">{row['title']}</span>
+
+{row.get('body', '') or ''}"""
+
+async def load_tipp_view():
+    """(Markdown, Chip-HTML) des aktuellen Tipps oder None.
+    Gecacht bis TIPP_CACHE_TTL bzw. Mitternacht (Berlin); Fehler werden nicht gecacht.
+    """
     today = today_berlin()
-    try:
-        data = (sb.table("site_news_tipp").select("*")
-                .eq("published", True)
-                .lte("valid_from", today)
-                .or_(f"valid_to.gte.{today},valid_to.is.null")
-                .order("valid_from", desc=True)
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()).data
-        return data[0] if data else None
-    except Exception:
-        return None
+    view = tipp_cache.get(today)
+    if view is not MISSING:
+        return view
+    return await tipp_flight.run(today, lambda: _build_tipp_view(today))
 
-def usage_snapshot_md():
+async def _build_tipp_view(today: str):
     try:
-        res = supabase.rpc("get_counter_snapshot", {"counter_name": COUNTER_NAME}).execute()
+        row = await _query_tipp(await get_supabase(), today)
+    except Exception as e:
+        print("[load_tipp] error:", e)
+        return None
+    view = (format_tipp_md(row), await tipp_chip_html(row)) if row else None
+    tipp_cache.set(today, view, ttl=min(TIPP_CACHE_TTL, seconds_until_berlin_midnight()))
+    return view
+
+# ----- Besucherzähler (serverseitig gebündelt) -----
+class CounterAggregator:
+    """Sammelt Pageviews im Speicher (je Counter-Name) und schreibt sie gebündelt
+    per RPC inc_counter – alle COUNTER_FLUSH_INTERVAL Sekunden oder sobald
+    COUNTER_FLUSH_THRESHOLD erreicht ist, plus ein letzter Flush beim Beenden.
+    Verlustfenster bei Absturz: höchstens ein Intervall bzw. ein Schwellwert.
+
+    Gelesen wird stale-while-revalidate: sofort aus dem letzten guten Snapshot
+    (get_counter_snapshot) plus den lokal gezählten Pageviews; ist der Snapshot
+    älter als max_age, wird er im Hintergrund erneuert. Bei RPC-Fehlern bleibt
+    der letzte gute Wert stehen.
+    """
+
+    def __init__(self, interval: float = 15.0, threshold: int = 50, max_age: float = 20.0):
+        self.interval = interval
+        self.threshold = threshold
+        self.max_age = max_age
+        self._pending: dict[str, int] = {}
+        self._flushed: dict[str, int] = {}          # seit dem letzten Snapshot geschrieben
+        self._snapshots: dict[str, tuple[int, int]] = {}   # name -> (today, total)
+        self._snapshot_at: dict[str, float] = {}
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._task = None
+
+    def hit(self, name: str, n: int = 1):
+        with self._lock:
+            pending = self._pending[name] = self._pending.get(name, 0) + n
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush_loop())
+        if pending >= self.threshold:
+            asyncio.get_running_loop().create_task(self.flush())
+
+    def drain(self) -> dict[str, int]:
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def _requeue(self, name: str, n: int):
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + n
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        batch = self.drain()
+        if not batch:
+            return
+        sb = await get_supabase()
+        for name, n in batch.items():
+            try:
+                await sb.rpc("inc_counter", {"counter_name": name, "by": n}).execute()
+                with self._lock:
+                    self._flushed[name] = self._flushed.get(name, 0) + n
+            except Exception as e:
+                print("[inc_counter] error:", e)
+                self._requeue(name, n)   # beim nächsten Flush erneut versuchen
+
+    def flush_sync(self):
+        """Letzter Flush beim Prozessende (eigener Sync-Client, Event-Loop läuft evtl. nicht mehr)."""
+        batch = self.drain()
+        if not batch or not (SUPABASE_URL and SUPABASE_KEY):
+            return
+        try:
+            sb = create_client(SUPABASE_URL, SUPABASE_KEY)
+            for name, n in batch.items():
+                sb.rpc("inc_counter", {"counter_name": name, "by": n}).execute()
+        except Exception as e:
+            print("[inc_counter] final flush error:", e)
+
+    async def refresh(self, name: str):
+        """Snapshot neu vom Server holen (get_counter_snapshot)."""
+        sb = await get_supabase()
+        with self._lock:
+            flushed_before = self._flushed.get(name, 0)
+        res = await sb.rpc("get_counter_snapshot", {"counter_name": name}).execute()
         row = (res.data or [{}])[0]
-        total = int(row.get("total") or 0)
-        today = int(row.get("today_count") or 0)
+        with self._lock:
+            self._snapshots[name] = (int(row.get("today_count") or 0), int(row.get("total") or 0))
+            self._snapshot_at[name] = time.monotonic()
+            self._flushed[name] = self._flushed.get(name, 0) - flushed_before
+
+    async def _refresh_quiet(self, name: str):
+        try:
+            await self.refresh(name)
+        except Exception as e:
+            print("[get_counter_snapshot] error (letzter Wert bleibt):", e)
+
+    def _revalidate(self, name: str) -> asyncio.Task:
+        """Startet höchstens einen Hintergrund-Refresh je Counter."""
+        task = self._refreshing.get(name)
+        if task is None or task.done():
+            task = self._refreshing[name] = asyncio.get_running_loop().create_task(self._refresh_quiet(name))
+        return task
+
+    async def snapshot(self, name: str) -> tuple[int, int] | None:
+        """(heute, gesamt) = letzter guter Snapshot + lokal Gezähltes, sofort.
+        None nur, solange noch nie ein Snapshot geladen werden konnte.
+        """
+        if name not in self._snapshots:
+            task = self._revalidate(name)
+            try:
+                await asyncio.wait_for(asyncio.shield(task), COUNTER_SNAPSHOT_COLD_WAIT)
+            except asyncio.TimeoutError:
+                pass
+        elif time.monotonic() - self._snapshot_at.get(name, 0) > self.max_age:
+            self._revalidate(name)
+        with self._lock:
+            if name not in self._snapshots:
+                return None
+            today, total = self._snapshots[name]
+            local = self._pending.get(name, 0) + self._flushed.get(name, 0)
+        return today + local, total + local
+
+counter = CounterAggregator(interval=COUNTER_FLUSH_INTERVAL, threshold=COUNTER_FLUSH_THRESHOLD,
+                            max_age=COUNTER_SNAPSHOT_MAX_AGE)
+atexit.register(counter.flush_sync)
+
+def count_pageview(request) -> None:
+    """Zählt einen Seitenaufruf (nur auf erlaubten Hosts, wie bisher im Browser-JS)."""
+    headers = getattr(request, "headers", None) or {}
+    host = (headers.get("x-forwarded-host") or headers.get("host") or "").split(",")[0].strip()
+    if host.rsplit(":", 1)[0] in COUNTER_ALLOWED_HOSTS:
+        counter.hit(COUNTER_NAME)
+
+async def usage_snapshot_md():
+    try:
+        snap = await counter.snapshot(COUNTER_NAME)
+        if snap is None:
+            return "**Besucher Heute:** –", "**Besucher Gesamt:** –"
+        today, total = snap
         fmt = lambda n: f"{n:,}".replace(",", ".")
         return (
             f"**Besucher Heute:** {fmt(today)}",
@@ -187,7 +554,7 @@ def usage_snapshot_md():
 
 
 # ----- CTA URL Resolver -----
-def resolve_cta_url(row):
+async def resolve_cta_url(row):
     kind = (row.get("cta_kind") or "").lower()
     if kind == "external":
         return row.get("cta_url") or ""
@@ -195,14 +562,19 @@ def resolve_cta_url(row):
         b, p = row.get("storage_bucket"), row.get("storage_path")
         if not (b and p):
             return ""
-        return _public_url(supabase.storage.from_(b).get_public_url(p))
+        url = public_url_cache.get((b, p))
+        if url is MISSING:
+            sb = await get_supabase()
+            url = _public_url(await sb.storage.from_(b).get_public_url(p))
+            public_url_cache.set((b, p), url)
+        return url
     return ""
 
 # ----- Tipp Chip HTML -----
-def tipp_chip_html(row):
+async def tipp_chip_html(row):
     if not row:
         return ""
-    url = resolve_cta_url(row)
+    url = await resolve_cta_url(row)
     if not url:
         return ""
     label = (row.get("cta_label") or "Mehr Infos") + " ↗"
@@ -248,6 +620,8 @@ def format_event_card(event: dict) -> str:
 
     link_block = f"🔗 [Mehr erfahren]({link})" if link else ""
     pdf_block = f"📄 [PDF anzeigen]({pdf_url})" if pdf_url else ""
+    ev_id = event.get("id")
+    ics_block = f"🗓️ [In Kalender eintragen]({BASE_PATH}/ics/{ev_id})" if ev_id is not None else ""
 
     footer_parts = []
     if registration_block:
@@ -258,6 +632,8 @@ def format_event_card(event: dict) -> str:
         footer_parts.append(link_block)
     if pdf_block:
         footer_parts.append(pdf_block)
+    if ics_block:
+        footer_parts.append(ics_block)
 
     footer_line = "  |  ".join(footer_parts) if footer_parts else ""
 
@@ -274,6 +650,51 @@ def format_event_card(event: dict) -> str:
 """.strip("\n")
     return md
 
+# ----- Karten-Cache -----
+# Gleiches Event, gleiche Version -> gleiches Markdown. Schlüssel ist (id, updated_at)
+# oder – ohne updated_at – (id, Kartenfelder…): exakt, ohne Hash-Kollisionen, und
+# billiger als json+sha1. Eine neue Version ergibt einen neuen Schlüssel, die alte
+# Karte fällt per LRU raus. Dazu das fertig zusammengesetzte Seiten-Markdown je
+# Ergebnis-Tupel (Folge der Karten-Schlüssel).
+card_cache = TTLCache(maxsize=CARD_CACHE_SIZE, ttl=float("inf"))
+page_md_cache = TTLCache(maxsize=PAGE_MD_CACHE_SIZE, ttl=float("inf"))
+
+def _card_key(ev: dict):
+    """Cache-Schlüssel einer Karte oder None (nicht hashbare Werte -> ungecacht)."""
+    if ev.get("updated_at"):
+        key = (ev.get("id"), ev["updated_at"])
+    else:
+        key = (ev.get("id"),) + tuple(ev.get(c) for c in EVENT_CARD_COLUMNS)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def render_event_cards(rows) -> str:
+    """Karten einer Ergebnisseite, getrennt durch Linien – aus den Caches, wo möglich."""
+    if not rows:
+        return "Keine passenden Termine."
+    keys = [_card_key(e) for e in rows]
+    page_key = tuple(keys) if None not in keys else None
+    if page_key is not None:
+        md = page_md_cache.get(page_key)
+        if md is not MISSING:
+            return md
+
+    cards = []
+    for ev, key in zip(rows, keys):
+        card = card_cache.get(key) if key is not None else MISSING
+        if card is MISSING:
+            card = format_event_card(ev)
+            if key is not None:
+                card_cache.set(key, card)
+        cards.append(card)
+    md = "\n\n---\n\n".join(cards)
+    if page_key is not None:
+        page_md_cache.set(page_key, md)
+    return md
+
 # =============================
 # BLOCK 3 — Suche & Pagination
 # =============================
@@ -282,52 +703,798 @@ def format_event_card(event: dict) -> str:
 def _tokens(q: str):
     return [t for t in re.split(r"\s+", (q or '').strip()) if t]
 
-# ----- Suche Seite -----
-def search_page(query: str, page: int, show_all: bool, start_date_val: str | None):
-    try:
-        tbl = supabase.table("events").select("*", count="exact").eq("published", True)
-        start = (start_date_val or "").strip() if start_date_val else None
-        if not start and not show_all:
-            start = today_berlin()
-        if start:
-            tbl = tbl.gte("datum", start[:10])
-        for t in _tokens(query):
-            ilike = f"%{t}%"
-            tbl = tbl.or_("titel.ilike.{},kategorie.ilike.{},beschreibung.ilike.{},ort.ilike.{},status.ilike.{},team.ilike.{}".format(ilike, ilike, ilike, ilike, ilike, ilike))
-        tbl = tbl.order("datum", desc=False)
-        start_idx = max(0, (max(1, page) - 1) * EVENTS_PER_PAGE)
-        end_idx = start_idx + EVENTS_PER_PAGE - 1
-        res = tbl.range(start_idx, end_idx).execute()
-        data, total = res.data or [], res.count or 0
-        pages = max(1, math.ceil(total / EVENTS_PER_PAGE))
-        page = min(max(1, page), pages)
-        md = "\n\n---\n\n".join([format_event_card(e) for e in data]) if data else "Keine passenden Termine."
-        return md, f"**{total} Treffer** · Seite {page}/{pages}", query, page
-    except Exception as e:
-        return f"⚠️ Fehler bei der Suche: {e}\n\nBitte versuche es erneut oder setze die Filter zurück.", "**0 Treffer** · Seite 1/1", query, 1
-
-# ----- Navigation Update -----
-def update_nav_from_info(info: str):
-    m = re.search(r"Seite\s+(\d+)\s*/\s*(\d+)", info or "")
-    if not m:
-        return gr.update(visible=False), gr.update(visible=False)
-    page, pages = int(m.group(1)), int(m.group(2))
-    return gr.update(visible=page > 1), gr.update(visible=page < pages)
-
-# ----- Clamp Page -----
-def _clamp_page_for(q, page, show_all, start_date_val):
-    cq = supabase.table("events").select("id", count="exact").eq("published", True)
+# ----- Start-Datum -----
+def _start_date(show_all, start_date_val):
+    """Effektives Ab-Datum ('YYYY-MM-DD') oder None (= alle Termine)."""
     start = (start_date_val or "").strip() if start_date_val else None
     if not start and not show_all:
         start = today_berlin()
+    return start[:10] if start else None
+
+# ----- Facetten -----
+def _facets(*values) -> dict:
+    """Dropdown-Werte in FACET_COLUMNS-Reihenfolge -> {Spalte: Wert} (leere entfallen)."""
+    return {col: str(v) for col, v in zip(FACET_COLUMNS, values) if v}
+
+def _facet_key(facets: dict | None) -> tuple:
+    return tuple((col, facets[col]) for col in FACET_COLUMNS if (facets or {}).get(col))
+
+def _facet_value(ev: dict, col: str) -> str | None:
+    """Facettenwert eines Events oder None (leer; Ort bei show_location=False verborgen)."""
+    if col == "ort" and not bool(ev.get("show_location", True)):
+        return None
+    val = ev.get(col)
+    return str(val) if val is not None and str(val).strip() else None
+
+# ----- Spalten-Projektion -----
+def _event_columns(summary: bool = False, extra: tuple = ()) -> str:
+    """select()-String aus EVENT_CARD_COLUMNS.
+    summary=True: 'beschreibung' kommt aus der berechneten Spalte beschreibung_kurz
+    (gekürzt in Postgres, siehe supabase/migrations/*_events_beschreibung_kurz.sql).
+    """
+    cols = [("beschreibung:beschreibung_kurz" if summary and c == "beschreibung" else c)
+            for c in EVENT_CARD_COLUMNS + tuple(extra)]
+    return ",".join(cols)
+
+# ----- Filter-Kette -----
+def _apply_filters(tbl, q, show_all, start_date_val, facets: dict | None = None):
+    """Hängt Datums-, Facetten- (exakt) und Volltext-Filter an eine Events-Abfrage an."""
+    start = _start_date(show_all, start_date_val)
     if start:
-        cq = cq.gte("datum", start[:10])
+        tbl = tbl.gte("datum", start)
+    for col, val in (facets or {}).items():
+        if val:
+            tbl = tbl.eq(col, val)
+            if col == "ort":   # verborgene Orte sind nicht filterbar
+                tbl = tbl.eq("show_location", True)
     for t in _tokens(q):
         ilike = f"%{t}%"
-        cq = cq.or_("titel.ilike.{},kategorie.ilike.{},beschreibung.ilike.{},ort.ilike.{},status.ilike.{},team.ilike.{}".format(ilike, ilike, ilike, ilike, ilike, ilike))
-    total = (cq.execute().count or 0)
-    pages = max(1, math.ceil(total / EVENTS_PER_PAGE)) if total > 0 else 1
-    return min(max(1, page), pages)
+        tbl = tbl.or_("titel.ilike.{},kategorie.ilike.{},beschreibung.ilike.{},ort.ilike.{},status.ilike.{},team.ilike.{}".format(ilike, ilike, ilike, ilike, ilike, ilike))
+    return tbl
+
+# ----- Trefferzahl (COUNT_MODE) -----
+# count="exact" ist ein volles COUNT(*) über die gefilterte Menge (inkl. ILIKE-Scan)
+# bei jeder Seite. Alternativen:
+#   estimated – PostgREST zählt exakt bis db-max-rows, darüber Planner-Schätzung
+#   planned   – immer Planner-Schätzung (billig, bei ILIKE grob)
+#   none      – keine Zählung
+# Außer bei "exact" wird immer EVENTS_PER_PAGE+1 Zeilen geholt ("gibt es mehr?"):
+# ohne die Zusatzzeile ist die Zahl exakt ableitbar, mit ihr gibt es sicher
+# eine Folgeseite – auch wenn die Schätzung (bei ILIKE oft viel zu klein) weniger sagt.
+class ApproxCount(int):
+    """Geschätzte Trefferzahl; verhält sich wie int, wird aber als "ca." angezeigt."""
+
+def _count_total(mode: str, counted: int, page: int, got: int, has_more: bool = False) -> int:
+    if mode == "exact":
+        return counted
+    if not has_more:
+        return (page - 1) * EVENTS_PER_PAGE + got
+    floor = page * EVENTS_PER_PAGE + 1   # mindestens eine Zeile auf der Folgeseite
+    if mode == "estimated" and floor <= counted < COUNT_ESTIMATE_THRESHOLD:
+        return counted
+    return ApproxCount(max(counted, floor))
+
+# ----- Seite holen (ein Request) -----
+async def _fetch_page(query, page, show_all, start_date_val, count_mode: str | None = None, facets: dict | None = None):
+    """Holt Zeilen + Gesamtzahl einer Seite in einem einzigen Request.
+    Liegt die Seite hinter dem Ende (z. B. Treffer inzwischen gelöscht),
+    wird lokal aus der gelieferten Anzahl auf die letzte Seite geclamped
+    und nur dann ein zweites Mal gefragt (ohne exakte Zählung: einmal exakt).
+    Rückgabe: (data, total, page, pages) – total ist None bei COUNT_MODE="none",
+    ApproxCount bei geschätzter Zahl.
+    """
+    mode = count_mode or COUNT_MODE
+    sb = await get_supabase()
+    extra = 0 if mode == "exact" else 1   # eine Zeile mehr = "gibt es eine Folgeseite?"
+
+    async def run(p):
+        start_idx = (p - 1) * EVENTS_PER_PAGE
+        tbl = sb.table("events").select(_event_columns(EVENTS_SUMMARY_MODE), count=None if mode == "none" else mode).eq("published", True)
+        tbl = _apply_filters(tbl, query, show_all, start_date_val, facets).order("datum", desc=False).order("id", desc=False)
+        return await tbl.range(start_idx, start_idx + EVENTS_PER_PAGE - 1 + extra).execute()
+
+    page = max(1, page)
+    try:
+        res = await run(page)
+        data, counted = res.data or [], res.count or 0
+    except APIError as e:
+        # PostgREST: Offset jenseits des Endes -> 416 (PGRST103), Anzahl steht in den Details
+        m = re.search(r"only (\d+) rows", str(e.details or "")) if e.code == "PGRST103" else None
+        if not m:
+            raise
+        data, counted = [], int(m.group(1))
+    if mode != "exact" and not data and page > 1:
+        # hinter dem Ende und keine verlässliche Zahl zum Clampen -> einmal exakt
+        return await _fetch_page(query, page, show_all, start_date_val, "exact", facets)
+    has_more = len(data) > EVENTS_PER_PAGE
+    data = data[:EVENTS_PER_PAGE]
+    if mode == "none":
+        return data, None, page, page + 1 if has_more else page
+
+    total = _count_total(mode, counted, page, len(data), has_more)
+    pages = max(1, math.ceil(total / EVENTS_PER_PAGE))
+    if page > pages:   # nur bei exakter Zahl möglich
+        page = pages
+        res = await run(page)
+        data, total = (res.data or [])[:EVENTS_PER_PAGE], res.count or 0
+    return data, total, page, pages
+
+# ----- Seite holen (Keyset) -----
+def _keyset_filter(tbl, cursor):
+    """Nur Zeilen hinter cursor = (datum, id) in der Sortierung (datum, id)."""
+    datum, ev_id = cursor
+    return tbl.or_(f"datum.gt.{datum},and(datum.eq.{datum},id.gt.{ev_id})")
+
+async def _fetch_page_keyset(query, page, cursor, show_all, start_date_val, facets: dict | None = None):
+    """Seek-Pagination: Seite `page` beginnt direkt hinter `cursor` = (datum, id)
+    der letzten Zeile der Vorseite. Sortierung (datum, id) ist eindeutig,
+    Seite N kostet damit so viel wie Seite 1.
+    Gezählt (COUNT_MODE) werden nur die Zeilen ab dem Cursor; alle Vorseiten sind voll.
+    Rückgabe wie _fetch_page: (data, total, page, pages)
+    """
+    mode = COUNT_MODE
+    sb = await get_supabase()
+    tbl = sb.table("events").select(_event_columns(EVENTS_SUMMARY_MODE), count=None if mode == "none" else mode).eq("published", True)
+    tbl = _keyset_filter(_apply_filters(tbl, query, show_all, start_date_val, facets), cursor)
+    limit = EVENTS_PER_PAGE + (0 if mode == "exact" else 1)
+    res = await tbl.order("datum", desc=False).order("id", desc=False).limit(limit).execute()
+    data = res.data or []
+    if not data:
+        # Cursor zeigt hinter das Ende (Treffer gelöscht) -> klassisch clampen
+        return await _fetch_page(query, page, show_all, start_date_val, facets=facets)
+    has_more = len(data) > EVENTS_PER_PAGE
+    data = data[:EVENTS_PER_PAGE]
+    if mode == "none":
+        return data, None, page, page + 1 if has_more else page
+    rest = _count_total(mode, res.count or 0, 1, len(data), has_more)
+    total = (page - 1) * EVENTS_PER_PAGE + rest
+    if isinstance(rest, ApproxCount):
+        total = ApproxCount(total)
+    return data, total, page, max(1, math.ceil(total / EVENTS_PER_PAGE))
+
+# ----- Seite holen (Volltext-RPC) -----
+# Ein RPC statt ILIKE-Kette je Suchwort: GIN-indizierter tsvector mit deutscher
+# Konfiguration, Rang und Gesamtzahl in einer Antwort
+# (supabase/migrations/*_events_search_fts.sql). Fehlt die Funktion (Migration
+# nicht eingespielt), gilt SEARCH_FTS_RETRY Sekunden lang wieder der ILIKE-Builder;
+# andere Fehler (Netz, Timeout) schalten nichts um.
+_fts_disabled_until = 0.0
+
+def _fts_available() -> bool:
+    return SEARCH_FTS and time.monotonic() >= _fts_disabled_until
+
+def _fts_missing(e: Exception) -> bool:
+    """True, wenn PostgREST/Postgres die Funktion nicht kennt (PGRST202 / 42883)."""
+    return isinstance(e, APIError) and e.code in ("PGRST202", "42883")
+
+def _disable_fts(e: Exception) -> None:
+    global _fts_disabled_until
+    print(f"[search_events] fehlt, ILIKE für {SEARCH_FTS_RETRY:.0f}s:", e)
+    _fts_disabled_until = time.monotonic() + SEARCH_FTS_RETRY
+
+async def _rpc_search_events(query, show_all, start_date_val, sort: str, facets: dict | None,
+                             limit: int, offset: int, summary: bool = False):
+    """Ein Aufruf von search_events. Rückgabe: (rows, total)"""
+    sb = await get_supabase()
+    res = await sb.rpc("search_events", {
+        "q": query,
+        "start_date": _start_date(show_all, start_date_val),
+        "sort": sort,
+        "page_limit": limit,
+        "page_offset": offset,
+        "summary": summary,
+        "facets": dict(_facet_key(facets)),
+    }).execute()
+    body = res.data or {}
+    return body.get("rows") or [], int(body.get("total") or 0)
+
+async def _fetch_page_fts(query, page, show_all, start_date_val, sort: str = "datum", facets: dict | None = None):
+    """Wie _fetch_page, aber über die RPC search_events (sort: "datum" | "relevanz").
+    Rückgabe: (data, total, page, pages)
+    """
+    async def run(p):
+        return await _rpc_search_events(query, show_all, start_date_val, sort, facets,
+                                        EVENTS_PER_PAGE, (p - 1) * EVENTS_PER_PAGE, EVENTS_SUMMARY_MODE)
+
+    page = max(1, page)
+    data, total = await run(page)
+    pages = max(1, math.ceil(total / EVENTS_PER_PAGE))
+    if page > pages:
+        page = pages
+        data, total = await run(page)
+    return data, total, page, pages
+
+def _sort_value(label) -> str:
+    """UI-Auswahl ("Datum"/"Relevanz") -> "datum" | "relevanz"."""
+    return "relevanz" if str(label or "").strip().lower().startswith("relevanz") else "datum"
+
+def _page_cursor(cursors, page):
+    """Cursor für `page` aus der Session-Liste (cursors[i] = letzte Zeile von Seite i+1)."""
+    if PAGINATION_MODE != "keyset" or page < 2 or len(cursors) < page - 1:
+        return None
+    cursor = cursors[page - 2]
+    return tuple(cursor) if cursor and cursor[0] is not None else None
+
+# ----- Alle Treffer (Export) -----
+async def iter_matching_events(query, show_all, start_date_val, facets: dict | None = None, chunk: int = ICS_EXPORT_CHUNK):
+    """Async-Generator über *alle* Treffer der aktuellen Filter (nicht nur eine Seite),
+    nach Datum sortiert. Gleiche Quelle wie die Ergebnisliste (lokaler Index,
+    Volltext-RPC oder ILIKE-Builder), damit der Export genau die angezeigten
+    Treffer enthält. Aus der DB blockweise geladen – Speicherbedarf = ein Block.
+    """
+    if LOCAL_SEARCH:
+        try:
+            rows = await local_index.matching(query, show_all, start_date_val, facets)
+        except Exception as e:
+            print("[local_index] error, fallback auf DB:", e)
+        else:
+            for ev in rows:
+                yield ev
+            return
+
+    if _tokens(query) and _fts_available():
+        try:
+            rows, total = await _rpc_search_events(query, show_all, start_date_val, "datum", facets, chunk, 0)
+        except Exception as e:
+            if not _fts_missing(e):
+                raise
+            _disable_fts(e)
+        else:
+            offset = 0
+            while True:
+                for ev in rows:
+                    yield ev
+                offset += len(rows)
+                if len(rows) < chunk or offset >= total:
+                    return
+                rows, total = await _rpc_search_events(query, show_all, start_date_val, "datum", facets, chunk, offset)
+
+    sb = await get_supabase()
+    cursor = None
+    while True:
+        tbl = sb.table("events").select(_event_columns()).eq("published", True)
+        tbl = _apply_filters(tbl, query, show_all, start_date_val, facets)
+        if cursor:
+            tbl = _keyset_filter(tbl, cursor)
+        res = await tbl.order("datum", desc=False).order("id", desc=False).limit(chunk).execute()
+        rows = res.data or []
+        for ev in rows:
+            yield ev
+        if len(rows) < chunk or rows[-1].get("datum") is None:
+            return   # letzter Block (Zeilen ohne Datum stehen am Ende, kein Cursor möglich)
+        cursor = (rows[-1]["datum"], rows[-1]["id"])
+
+# Export-Dateien liegen in ICS_EXPORT_DIR/<Hash der Suche>/termine_….ics:
+# dieselbe Suche bekommt innerhalb SEARCH_CACHE_TTL dieselbe Datei (auch Gradio
+# kopiert sie dann nicht erneut in seinen Cache), ältere als ICS_EXPORT_MAX_AGE
+# werden bei jedem Export entfernt. Gradios Kopien räumt delete_cache der Blocks ab.
+def _prune_ics_exports(now: float) -> None:
+    if not ICS_EXPORT_DIR.is_dir():
+        return
+    for sub in ICS_EXPORT_DIR.iterdir():
+        try:
+            for f in sub.iterdir():
+                if now - f.stat().st_mtime > ICS_EXPORT_MAX_AGE:
+                    f.unlink(missing_ok=True)
+            if not any(sub.iterdir()):
+                sub.rmdir()
+        except OSError:
+            pass   # parallel gelöscht/geschrieben -> beim nächsten Export
+
+async def export_ics_file(query, show_all, start_date_val, facets: dict | None = None) -> str:
+    """Schreibt alle Treffer als eine .ics-Datei (chunkweise) und liefert den Pfad."""
+    now = time.time()
+    _prune_ics_exports(now)
+    key = _search_key(query, 1, show_all, start_date_val, "datum", facets)
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    name = f"termine_{slugify(query) if query else 'alle'}_{today_berlin()}.ics"
+    path = ICS_EXPORT_DIR / digest / name
+    try:
+        if now - path.stat().st_mtime < SEARCH_CACHE_TTL:
+            return str(path)
+    except OSError:
+        pass
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # erst temporär schreiben, dann atomar ersetzen (parallele Exporte derselben Suche)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            async for chunk in aiter_ics_calendar(iter_matching_events(query, show_all, start_date_val, facets)):
+                fh.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return str(path)
+
+# ----- ICS-Import (Bulk-Upsert) -----
+# .ics-Datei -> events: gestreamt geparst (BLOCK 1b im Helper), geschrieben in
+# Blöcken zu ICS_IMPORT_BATCH Zeilen, ein upsert-Request je Block.
+# Idempotent über events.ics_uid (supabase/migrations/*_events_ics_uid.sql).
+# published wird nur mit publish=True gesetzt – ein erneuter Import
+# nimmt bereits freigegebene Termine also nicht wieder offline.
+
+async def import_ics_file(path, *, publish: bool = False, batch_size: int = ICS_IMPORT_BATCH, sb: AsyncClient | None = None) -> int:
+    """Importiert alle VEVENTs einer .ics-Datei; Rückgabe: Anzahl geschriebener Zeilen."""
+    if sb is None:
+        if not (SUPABASE_URL and SUPABASE_SERVICE_KEY):
+            raise RuntimeError("ICS-Import braucht SUPABASE_URL und SUPABASE_SERVICE_ROLE_KEY")
+        sb = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+
+    async def flush(rows):
+        await (sb.table("events")
+               .upsert(rows, on_conflict="ics_uid", returning=ReturnMethod.minimal)
+               .execute())
+
+    batch: dict[str, dict] = {}   # je ics_uid eine Zeile pro Block (sonst ON CONFLICT-Fehler)
+    written = 0
+    for props in iter_ics_vevents(path):
+        ev = vevent_to_event(props)
+        if ev is None:
+            continue
+        status = ev.pop("ics_status")
+        if publish:
+            ev["published"] = status != "CANCELLED"
+        batch[ev["ics_uid"]] = ev
+        if len(batch) >= batch_size:
+            await flush(list(batch.values()))
+            written += len(batch)
+            batch.clear()
+    if batch:
+        await flush(list(batch.values()))
+        written += len(batch)
+    return written
+
+# ----- Einzel-ICS-Cache (/ics/{id}) -----
+# Vorgerenderte .ics-Bytes je Event, Version = updated_at oder Inhalts-Hash.
+# Wird mit den angezeigten Ergebnisseiten vorgewärmt: "In Kalender eintragen"
+# kostet dann weder DB-Abfrage noch Serialisierung.
+ics_cache = TTLCache(maxsize=ICS_CACHE_SIZE, ttl=ICS_CACHE_TTL)
+ics_flight = SingleFlight()
+
+def _event_version(ev: dict) -> str:
+    if ev.get("updated_at"):
+        return str(ev["updated_at"])
+    return hashlib.sha1(json.dumps(ev, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def _render_ics_entry(ev: dict, version: str) -> dict:
+    body = build_ics_event(ev)
+    return {
+        "version": version,
+        "body": body,
+        "filename": ics_filename_for_event(ev),
+        "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+    }
+
+def warm_ics_cache(rows) -> None:
+    """Rendert .ics für die übergebenen Events, sofern (id, Version) noch nicht im Cache.
+    Zählt keine Hits (die Kennzahlen sollen echte Downloads zeigen); ein Event, das
+    sich nicht rendern lässt, wird übersprungen statt die Ergebnisseite zu kippen.
+    """
+    for ev in rows:
+        ev_id = ev.get("id")
+        if ev_id is None:
+            continue
+        key = str(ev_id)
+        try:
+            version = _event_version(ev)
+            entry = ics_cache.peek(key)
+            if entry is MISSING or entry["version"] != version:
+                ics_cache.set(key, _render_ics_entry(ev, version))
+        except Exception as e:
+            print(f"[warm_ics_cache] Event {ev_id} übersprungen:", e)
+
+async def get_event_ics(ev_id: str) -> dict | None:
+    """Cache-Eintrag für ein Event; bei Miss eine DB-Abfrage (nur veröffentlichte Events)."""
+    entry = ics_cache.get(ev_id)
+    if entry is not MISSING:
+        return entry
+    return await ics_flight.run(ev_id, lambda: _load_event_ics(ev_id))
+
+async def _load_event_ics(ev_id: str) -> dict | None:
+    sb = await get_supabase()
+    res = await sb.table("events").select(_event_columns()).eq("published", True).eq("id", ev_id).limit(1).execute()
+    if not res.data:
+        return None
+    ev = res.data[0]
+    entry = _render_ics_entry(ev, _event_version(ev))
+    ics_cache.set(ev_id, entry)
+    return entry
+
+# =============================
+# BLOCK 3a — Lokaler Suchindex (optional, LOCAL_SEARCH=1)
+# =============================
+# Hält einen regelmäßig erneuerten Snapshot aller veröffentlichten Events im
+# Speicher und beantwortet Token-UND-Suche, Datumsfilter und Pagination
+# in-process – ohne ILIKE-Seqscan in Postgres.
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def _fold(text) -> str:
+    """Umlaut-Folding wie bei slugify: 'Bürger Straße' -> 'burger strasse'."""
+    s = unicodedata.normalize("NFKD", str(text or "").casefold())
+    return s.encode("ascii", "ignore").decode("ascii")
+
+async def _load_published_events(chunk: int = 1000, columns: str | None = None, since: str | None = None) -> list[dict]:
+    """Alle veröffentlichten Events (optional nur `columns`, ab Datum `since`),
+    sortiert nach (datum, id), in Blöcken geladen.
+    """
+    sb = await get_supabase()
+    rows, offset = [], 0
+    while True:
+        tbl = sb.table("events").select(columns or _event_columns(extra=EVENT_SEARCH_COLUMNS)).eq("published", True)
+        if since:
+            tbl = tbl.gte("datum", since)
+        res = await (tbl.order("datum", desc=False).order("id", desc=False)
+               .range(offset, offset + chunk - 1).execute())
+        batch = res.data or []
+        rows.extend(batch)
+        if len(batch) < chunk:
+            return rows
+        offset += chunk
+
+class LocalEventIndex:
+    """Snapshot + invertierter Index (Wort -> {Position: Score})
+    und Facetten-Index (Spalte -> Wert -> aufsteigende Positionen).
+
+    Gewichtung fürs Ranking: Treffer im Titel zählen mehr als in der Beschreibung.
+    """
+    FIELDS = {"titel": 3, "kategorie": 2, "ort": 2, "team": 1, "status": 1, "beschreibung": 1}
+
+    def __init__(self, loader, refresh: float = 300.0):
+        self._loader = loader
+        self.refresh = refresh
+        self._snap = None
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    async def _build(self) -> dict:
+        events = await self._loader()
+        # Termine ohne Datum ans Ende (wie ORDER BY datum in Postgres); "dates"
+        # enthält nur die datierten, damit bisect auf einer sortierten Liste läuft
+        dated = [e for e in events if e.get("datum")]
+        events = dated + [e for e in events if not e.get("datum")]
+        postings: dict[str, dict[int, int]] = {}
+        facets: dict[str, dict[str, list[int]]] = {col: {} for col in FACET_COLUMNS}
+        texts: list[tuple[str, ...]] = []
+        for pos, ev in enumerate(events):
+            folded = tuple(_fold(ev.get(field)) for field in self.FIELDS)
+            texts.append(folded)
+            for text, weight in zip(folded, self.FIELDS.values()):
+                for w in _WORD_RE.findall(text):
+                    bucket = postings.setdefault(w, {})
+                    bucket[pos] = bucket.get(pos, 0) + weight
+            for col in FACET_COLUMNS:
+                val = _facet_value(ev, col)
+                if val is not None:
+                    facets[col].setdefault(val, []).append(pos)
+        return {
+            "built_at": time.monotonic(),
+            "events": events,
+            "dates": [str(e["datum"])[:10] for e in dated],   # Positionen 0 .. len(dates)-1
+            "postings": postings,
+            "texts": texts,       # gefaltete FIELDS je Position (Teilstring-Suche ohne Wortzeichen)
+            "facets": facets,
+            "matches": TTLCache(maxsize=LOCAL_MATCH_CACHE_SIZE, ttl=float("inf")),   # Query-Wort -> {Position: Score}
+            "facet_counts": {},   # Ab-Datum -> Facetten-Zählung (pro Snapshot gecacht)
+        }
+
+    async def _refresh_bg(self):
+        try:
+            self._snap = await self._build()
+        except Exception as e:
+            print("[local_index] refresh error:", e)
+
+    async def snapshot(self) -> dict:
+        """Aktueller Snapshot; der erste Aufbau wird abgewartet, spätere laufen im Hintergrund."""
+        snap = self._snap
+        if snap is None:
+            async with self._lock:
+                if self._snap is None:
+                    self._snap = await self._build()
+                return self._snap
+        if time.monotonic() - snap["built_at"] > self.refresh:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._refresh_bg())
+        return snap
+
+    def invalidate(self):
+        """Erzwingt einen Neuaufbau beim nächsten Zugriff."""
+        self._snap = None
+
+    def _match(self, snap: dict, word: str) -> dict[int, int]:
+        # Teilwort-Semantik wie ILIKE '%t%': alle Index-Wörter, die das Query-Wort enthalten
+        hit = snap["matches"].get(word)
+        if hit is MISSING:
+            hit = {}
+            if _WORD_RE.fullmatch(word):
+                for w, bucket in snap["postings"].items():
+                    if word in w:
+                        for pos, score in bucket.items():
+                            hit[pos] = hit.get(pos, 0) + score
+            elif word:
+                # Token ohne Wortzeichen ("!!", "--"): Teilstring in den gefalteten Feldern
+                weights = tuple(self.FIELDS.values())
+                for pos, folded in enumerate(snap["texts"]):
+                    score = sum(wt for text, wt in zip(folded, weights) if word in text)
+                    if score:
+                        hit[pos] = score
+            snap["matches"].set(word, hit)
+        return hit
+
+    async def facet_counts(self, start: str | None) -> dict:
+        """Facettenwerte mit Anzahl ab Datum `start`, häufigste zuerst (pro Snapshot gecacht)."""
+        snap = await self.snapshot()
+        hit = snap["facet_counts"].get(start)
+        if hit is None:
+            lo, hi = self._date_range(snap, start)
+            hit = {}
+            for col, values in snap["facets"].items():
+                # Positionen sind aufsteigend = nach Datum sortiert -> Anzahl in [lo, hi) per bisect
+                counts = [(val, bisect.bisect_left(pos, hi) - bisect.bisect_left(pos, lo)) for val, pos in values.items()]
+                hit[col] = _top_facet_values(counts)
+            snap["facet_counts"][start] = hit
+        return hit
+
+    @staticmethod
+    def _date_range(snap: dict, start: str | None) -> tuple[int, int]:
+        """Positionen [lo, hi) mit datum >= start; ohne start alle (auch ohne Datum)."""
+        if not start:
+            return 0, len(snap["events"])
+        return bisect.bisect_left(snap["dates"], start), len(snap["dates"])
+
+    def _positions(self, snap: dict, query, show_all, start_date_val, order: str = "datum", facets: dict | None = None):
+        """Snapshot-Positionen aller Treffer in Anzeige-Reihenfolge."""
+        lo, hi = self._date_range(snap, _start_date(show_all, start_date_val))
+
+        allowed = None
+        for col, val in _facet_key(facets):
+            hit = snap["facets"].get(col, {}).get(val, ())
+            allowed = set(hit) if allowed is None else allowed.intersection(hit)
+
+        scores = None
+        for t in _tokens(query):
+            folded = _fold(t)
+            # ohne Wortzeichen bleibt der ganze Token; faltet er zu nichts, trifft er nichts
+            for w in _WORD_RE.findall(folded) or [folded]:
+                m = self._match(snap, w)
+                scores = dict(m) if scores is None else {p: s + m[p] for p, s in scores.items() if p in m}
+        if scores is not None and allowed is not None:
+            scores = {p: s for p, s in scores.items() if p in allowed}
+
+        if scores is None and allowed is not None:
+            positions = sorted(p for p in allowed if lo <= p < hi)
+        elif scores is None:
+            positions = range(lo, hi)
+        elif order == "relevanz":
+            positions = sorted((p for p in scores if lo <= p < hi), key=lambda p: (-scores[p], p))
+        else:
+            positions = sorted(p for p in scores if lo <= p < hi)
+        return positions
+
+    async def matching(self, query, show_all, start_date_val, facets: dict | None = None) -> list[dict]:
+        """Alle Treffer (nach Datum), z. B. für den .ics-Export."""
+        snap = await self.snapshot()
+        return [snap["events"][p] for p in self._positions(snap, query, show_all, start_date_val, "datum", facets)]
+
+    async def page(self, query, page, show_all, start_date_val, order: str = "datum", facets: dict | None = None):
+        """Wie _fetch_page, aber aus dem Speicher. Rückgabe: (data, total, page, pages)"""
+        snap = await self.snapshot()
+        events = snap["events"]
+        positions = self._positions(snap, query, show_all, start_date_val, order, facets)
+        total = len(positions)
+        pages = max(1, math.ceil(total / EVENTS_PER_PAGE))
+        page = min(max(1, page), pages)
+        start_idx = (page - 1) * EVENTS_PER_PAGE
+        data = [events[p] for p in positions[start_idx:start_idx + EVENTS_PER_PAGE]]
+        return data, total, page, pages
+
+local_index = LocalEventIndex(_load_published_events, refresh=LOCAL_INDEX_REFRESH)
+
+# ----- Facetten-Zählung -----
+# Anzahl kommender Termine je Facettenwert für die Dropdowns. Einmal je
+# Snapshot berechnet und für alle Besucher gecacht – der Seitenaufbau kostet
+# dafür keine eigene Abfrage:
+#   LOCAL_SEARCH=1 – aus dem Facetten-Index des lokalen Snapshots
+#   sonst          – RPC event_facet_counts (ein Request), Fallback: nur die
+#                    Facetten-Spalten laden und in Python zählen
+facet_cache = TTLCache(maxsize=4, ttl=FACET_CACHE_TTL)
+facet_flight = SingleFlight()
+
+def _top_facet_values(counts) -> list[tuple[str, int]]:
+    """(Wert, Anzahl)-Paare ohne leere Werte, häufigste zuerst, höchstens FACET_MAX_VALUES."""
+    return sorted(((v, n) for v, n in counts if n > 0), key=lambda vn: (-vn[1], vn[0]))[:FACET_MAX_VALUES]
+
+def count_facets(rows) -> dict:
+    """{Spalte: [(Wert, Anzahl), ...]} für FACET_COLUMNS über die übergebenen Events."""
+    counts: dict[str, dict[str, int]] = {col: {} for col in FACET_COLUMNS}
+    for ev in rows:
+        for col in FACET_COLUMNS:
+            val = _facet_value(ev, col)
+            if val is not None:
+                counts[col][val] = counts[col].get(val, 0) + 1
+    return {col: _top_facet_values(c.items()) for col, c in counts.items()}
+
+async def load_facet_counts() -> dict:
+    """Facetten-Zählung der kommenden Termine (gecacht bis FACET_CACHE_TTL bzw. Mitternacht)."""
+    today = today_berlin()
+    if LOCAL_SEARCH:
+        try:
+            return await local_index.facet_counts(today)
+        except Exception as e:
+            print("[local_index] facet error, fallback auf DB:", e)
+    hit = facet_cache.get(today)
+    if hit is not MISSING:
+        return hit
+    return await facet_flight.run(today, lambda: _load_facet_counts(today))
+
+async def _load_facet_counts(today: str) -> dict:
+    sb = await get_supabase()
+    try:
+        res = await sb.rpc("event_facet_counts", {"start_date": today}).execute()
+        body = res.data or {}
+        facets = {col: _top_facet_values((str(v), int(n)) for v, n in body.get(col) or []) for col in FACET_COLUMNS}
+    except Exception as e:
+        print("[event_facet_counts] error, zähle lokal:", e)
+        facets = count_facets(await _load_published_events(columns=",".join(FACET_COLUMNS + ("show_location",)), since=today))
+    facet_cache.set(today, facets, ttl=min(FACET_CACHE_TTL, seconds_until_berlin_midnight()))
+    return facets
+
+def facet_choices(values) -> list[tuple[str, str]]:
+    """Dropdown-Auswahl: "Alle" + "Wert (Anzahl)"."""
+    return [("Alle", "")] + [(f"{v} ({n})", v) for v, n in values]
+
+# ----- Ergebnis-Cache -----
+search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+# Gleichzeitige identische Suchen (z. B. Newsletter -> hunderte Initial-Loads)
+# teilen sich eine DB-Abfrage je normalisiertem Key.
+page_flight = SingleFlight()
+
+def _search_key(query, page, show_all, start_date_val, sort: str = "datum", facets: dict | None = None):
+    """Normalisierter Cache-Key: (Tokens, Ab-Datum, show_all, Seite, Sortierung, Facetten).
+    Ohne Suchwort gibt es keine Relevanz -> immer "datum".
+    """
+    tokens = tuple(t.lower() for t in _tokens(query))
+    return (tokens, _start_date(show_all, start_date_val), bool(show_all), max(1, page),
+            (sort if tokens else "datum"), _facet_key(facets))
+
+async def _fetch_page_cached(query, page, show_all, start_date_val, cursor=None, sort: str = "datum", facets: dict | None = None):
+    """_fetch_page mit TTL/LRU-Cache davor (Fehler werden nicht gecacht).
+    Mit LOCAL_SEARCH=1 antwortet der lokale Index, Postgres ist dann nur Fallback.
+    """
+    if LOCAL_SEARCH:
+        try:
+            return await local_index.page(query, page, show_all, start_date_val, order=sort, facets=facets)
+        except Exception as e:
+            print("[local_index] error, fallback auf DB:", e)
+    key = _search_key(query, page, show_all, start_date_val, sort, facets) + (cursor,)
+    hit = search_cache.get(key)
+    if hit is not MISSING:
+        return hit
+    # gleiche Seite gerade in Arbeit (anderer Besucher oder Prefetch) -> mitwarten
+    return await page_flight.run(key, lambda: _load_page(key, query, page, show_all, start_date_val, cursor, sort, facets))
+
+async def _load_page(key, query, page, show_all, start_date_val, cursor=None, sort: str = "datum", facets: dict | None = None):
+    if _tokens(query) and _fts_available():
+        try:
+            result = await _fetch_page_fts(query, page, show_all, start_date_val, sort, facets)
+            search_cache.set(key, result)
+            return result
+        except Exception as e:
+            if not _fts_missing(e):
+                raise   # z. B. Netzfehler: Fehlerseite wie bei jeder anderen Abfrage
+            _disable_fts(e)
+    # ILIKE-Builder: sortiert immer nach Datum (Relevanz gibt es nur per RPC/lokalem Index)
+    if cursor:
+        result = await _fetch_page_keyset(query, page, cursor, show_all, start_date_val, facets)
+    else:
+        result = await _fetch_page(query, page, show_all, start_date_val, facets=facets)
+    search_cache.set(key, result)
+    return result
+
+# ----- Prefetch der Folgeseite -----
+# Sobald Seite N angezeigt wird, lädt ein Hintergrund-Task Seite N+1 in den
+# search_cache; "Weiter" kommt dann meist direkt aus dem Speicher. Läuft über
+# page_flight: wer die Seite währenddessen anfragt, wartet auf denselben Task.
+def prefetch_page(query, page, show_all, start_date_val, cursor=None, sort: str = "datum", facets: dict | None = None) -> None:
+    if not PAGE_PREFETCH or LOCAL_SEARCH:
+        return   # lokaler Index blättert ohnehin ohne DB
+    key = _search_key(query, page, show_all, start_date_val, sort, facets) + (cursor,)
+    if key in page_flight or key in search_cache:
+        return
+    page_flight.start(key, lambda: _load_page(key, query, page, show_all, start_date_val, cursor, sort, facets))
+
+# ----- Suche Seite -----
+async def search_page(query: str, page: int, show_all: bool, start_date_val: str | None, cursors: list | None = None, sort: str = "datum", facets: dict | None = None):
+    """Rendert eine Ergebnisseite.
+    Rückgabe: (Markdown, Pager {page, pages, total}, Query, Seite, Cursor-Liste für PAGINATION_MODE="keyset")
+    """
+    cursors = list(cursors or [])
+    try:
+        page = max(1, page)
+        data, total, page, pages = await _fetch_page_cached(query, page, show_all, start_date_val, _page_cursor(cursors, page), sort, facets)
+        if data:
+            cursors = cursors[:page - 1] + [(data[-1].get("datum"), data[-1].get("id"))]
+            if not EVENTS_SUMMARY_MODE:   # gekürzte Beschreibung gehört nicht in die .ics
+                warm_ics_cache(data)
+        md = render_event_cards(data)
+        pager = {"page": page, "pages": pages, "total": total if total is None else int(total),
+                 "approx": isinstance(total, ApproxCount)}
+        return md, pager, query, page, cursors
+    except Exception as e:
+        return f"⚠️ Fehler bei der Suche: {e}\n\nBitte versuche es erneut oder setze die Filter zurück.", {"page": 1, "pages": 1, "total": 0, "error": True}, query, 1, []
+
+# ----- Seitenfenster je Session -----
+# Die zuletzt gezeigten PAGE_WINDOW_SIZE Seiten (Markdown + Pager) liegen im
+# gr.State der Session: Zurück blättern braucht dann weder DB noch Cache-Lookup.
+# Gilt nur für dieselbe Suche (Tokens, Ab-Datum, show_all, Sortierung, Facetten) und höchstens
+# SEARCH_CACHE_TTL Sekunden – danach wird normal neu geladen.
+def _window_get(window, wkey, page):
+    if not window or window.get("key") != wkey:
+        return None
+    hit = window["pages"].get(page)
+    if hit is None or time.monotonic() - hit[2] > SEARCH_CACHE_TTL:
+        return None
+    return hit[0], hit[1]
+
+def _window_put(window, wkey, page, md, pager) -> dict:
+    if not window or window.get("key") != wkey:
+        window = {"key": wkey, "pages": {}}
+    pages = window["pages"]
+    pages.pop(page, None)
+    pages[page] = (md, pager, time.monotonic())
+    while len(pages) > PAGE_WINDOW_SIZE:
+        pages.pop(next(iter(pages)))   # älteste zuerst
+    return window
+
+async def show_page(query, page, show_all, start_date_val, cursors=None, window=None, sort: str = "datum", facets: dict | None = None):
+    """search_page mit Seitenfenster der Session und Prefetch der Folgeseite.
+    Rückgabe: (Markdown, Pager, Seite, Cursor-Liste, Seitenfenster)
+    """
+    wkey = _search_key(query, 1, show_all, start_date_val, sort, facets)
+    hit = _window_get(window, wkey, max(1, page))
+    if hit is not None:
+        md, pager = hit
+        cursors = list(cursors or [])
+    else:
+        md, pager, _, _, cursors = await search_page(query, page, show_all, start_date_val, cursors, sort, facets)
+        if not pager.get("error"):
+            window = _window_put(window, wkey, pager["page"], md, pager)
+    page = pager["page"]
+    if page < pager["pages"]:
+        prefetch_page(query, page + 1, show_all, start_date_val, _page_cursor(cursors, page + 1), sort, facets)
+    return md, pager, page, cursors, window
+
+# ----- Pager -> UI -----
+# Page-Info und Zurück/Weiter kommen aus dem strukturierten Pager in derselben
+# Antwort wie die Ergebnisse (kein zweiter Request, kein Parsen von "Seite X/Y").
+def page_info_md(pager: dict) -> str:
+    total = pager["total"]
+    if total is None:   # COUNT_MODE="none": nur die Seite
+        return f"**Seite {pager['page']}**"
+    if pager.get("approx"):
+        shown = f"{round(total, -1):,}".replace(",", ".") if total >= 100 else str(total)
+        return f"**ca. {shown} Treffer** · Seite {pager['page']}"
+    return f"**{total} Treffer** · Seite {pager['page']}/{pager['pages']}"
+
+def nav_updates(pager: dict):
+    return gr.update(visible=pager["page"] > 1), gr.update(visible=pager["page"] < pager["pages"])
+
+# ----- Live-Suche: Debounce / latest wins -----
+# Pro Session zählt nur die jüngste Eingabe; ältere Aufrufe verwerfen ihr Ergebnis.
+_search_seq = TTLCache(maxsize=10_000, ttl=3600)
+_search_seq_lock = threading.Lock()
+
+def _next_search_seq(session: str) -> int:
+    with _search_seq_lock:
+        seq = _search_seq.get(session)
+        seq = 1 if seq is MISSING else seq + 1
+        _search_seq.set(session, seq)
+        return seq
+
+def _is_latest_search(session: str, seq: int) -> bool:
+    with _search_seq_lock:
+        return _search_seq.get(session) == seq
 
 # =============================
 # BLOCK 4 — UI & Handlers
@@ -348,43 +1515,10 @@ CUSTOM_CSS += """
 }
 """
 
-with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}") as demo:
+with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}", delete_cache=(ICS_EXPORT_MAX_AGE, ICS_EXPORT_MAX_AGE)) as demo:
 #with gr.Blocks(css=CUSTOM_CSS, title=f"{APP_TITLE} · {__APP_VERSION__}") as demo:
 
-    # Pageview-Counter (nur auf erlaubten Hosts)
-
-    if SUPABASE_URL and SUPABASE_KEY:
-        demo.load(
-            fn=None,
-            js=f"""
-() => {{
-  const allowed = ["events.turban-direkt.de","localhost","127.0.0.1"];
-  if (!allowed.includes(location.hostname)) return null;
-
-
-  fetch("{SUPABASE_URL}/rest/v1/rpc/inc_counter", {{
-    method: "POST",
-    headers: {{
-      "Content-Type": "application/json",
-      "apikey": "{SUPABASE_KEY}",
-      "Authorization": "Bearer {SUPABASE_KEY}"
-    }},
-    body: JSON.stringify({{ counter_name: "events.pageview", by: 1 }})
-  }})
-  .then(r => {{
-    if (r.ok) {{
-      console.log("[pageview] bumped OK");
-    }} else {{
-      console.warn("[pageview] bump failed", r.status);
-    }}
-  }})
-  .catch(e => console.error("[pageview] bump error", e));
-
-  return null;
-}}
-        """,
-        queue=False
-    )
+    # Pageview-Counter: serverseitig in bootstrap() -> count_pageview() (gebündelt, siehe CounterAggregator)
 
     # Disclaimer-Row
     with gr.Row(visible=True, elem_classes="kalli-disclaimer") as disclaimer_box:
@@ -416,14 +1550,6 @@ with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}") as demo:
         counter_today = gr.Markdown("**Besucher Heute:** –")
         counter_total = gr.Markdown("**Besucher Gesamt:** –")
 
- # 👉 beim UI-Start Zahlen laden (Client verbindet)
-    demo.load(
-        usage_snapshot_md,
-        inputs=[],
-        outputs=[counter_today, counter_total],
-        queue=False
-    )
-
     # ----- Tipp des Tages -----
     with gr.Row():
         tipp_md = gr.Markdown(visible=False)
@@ -449,6 +1575,15 @@ with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}") as demo:
         container=False
     )
         start_date_inp = gr.DateTime(label="Ab Datum", include_time=False, type="string", info="leer = Standard (nur kommende)")
+        sort_inp = gr.Radio(choices=["Datum", "Relevanz"], value="Datum", label="Sortierung", info="Relevanz wirkt nur mit Suchbegriff")
+
+    # ----- Facetten (Auswahl + Anzahl kommender Termine kommen mit dem Bootstrap) -----
+    with gr.Row(elem_id="facetbar"):
+        kategorie_inp = gr.Dropdown(choices=facet_choices([]), value="", label="Kategorie")
+        ort_inp = gr.Dropdown(choices=facet_choices([]), value="", label="Ort")
+        team_inp = gr.Dropdown(choices=facet_choices([]), value="", label="Team")
+        level_inp = gr.Dropdown(choices=facet_choices([]), value="", label="Zielgruppe")
+    facet_inputs = [kategorie_inp, ort_inp, team_inp, level_inp]   # Reihenfolge = FACET_COLUMNS
 
     # ----- Navigation & Print -----
     with gr.Row(elem_classes="kalli-actions"):
@@ -456,6 +1591,8 @@ with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}") as demo:
         back_btn = gr.Button("⬅️ Zurück")
         next_btn = gr.Button("Weiter ➡️")
         print_btn = gr.Button("🖨 Drucken", elem_id="btn-print")
+        ics_btn = gr.Button("📅 Kalender (.ics)", elem_id="btn-ics")
+    ics_file = gr.File(label="Kalender-Export (alle Treffer)", visible=False, elem_id="ics-export")
 
 
     print_evt = print_btn.click(fn=lambda: None, inputs=None, outputs=None, queue=False)
@@ -494,77 +1631,290 @@ with gr.Blocks(css=CUSTOM_CSS, title=f"{BROWSER_TITLE}") as demo:
     output_box = gr.Markdown(elem_id="kalli-events")
     q_state = gr.State("")
     current_page = gr.State(1)
+    page_cursors = gr.State([])   # Keyset-Cursor je besuchter Seite (PAGINATION_MODE="keyset")
+    page_window = gr.State(None)  # zuletzt gezeigte Seiten dieser Session (siehe show_page)
 
     # ----- Handler: do_search -----
-    def do_search(q, show_all, start_date_val):
+    async def do_search(q, show_all, start_date_val, sort_val="Datum", kategorie="", ort="", team="", event_level=""):
         """Search handler.
         Normalisiert die Query (min. 2 Zeichen), ruft die Datenabfrage auf
-        und setzt gleichzeitig den internen Zustand (q_state, current_page).
+        und setzt gleichzeitig den internen Zustand (q_state, current_page, page_cursors).
         """
         qs = (q or "").strip()
         if qs and len(qs) < 2:
-            md, info, _, _ = search_page("", 1, show_all, start_date_val)
-            return md, info, "", 1
-        md, info, _, _ = search_page(qs, 1, show_all, start_date_val)
-        return md, info, qs, 1
+            qs = ""
+        md, pager, _, cursors, window = await show_page(qs, 1, show_all, start_date_val, sort=_sort_value(sort_val),
+                                                        facets=_facets(kategorie, ort, team, event_level))
+        return md, page_info_md(pager), qs, 1, cursors, window, *nav_updates(pager)
+
+    # ----- Handler: Live-Suche (Debounce) -----
+    async def do_search_live(q, show_all, start_date_val, sort_val, kategorie, ort, team, event_level, request: gr.Request):
+        """Live-Suche beim Tippen.
+        Wartet SEARCH_DEBOUNCE_MS Ruhezeit ab; kam inzwischen eine neuere Eingabe
+        derselben Session, wird nichts abgefragt bzw. das Ergebnis verworfen.
+        """
+        session = getattr(request, "session_hash", None) or ""
+        seq = _next_search_seq(session)
+        await asyncio.sleep(SEARCH_DEBOUNCE_MS / 1000)
+        if not _is_latest_search(session, seq):
+            return (gr.skip(),) * 8
+        result = await do_search(q, show_all, start_date_val, sort_val, kategorie, ort, team, event_level)
+        if not _is_latest_search(session, seq):
+            return (gr.skip(),) * 8
+        return result
 
     # ----- Handler: Navigation -----
-    def go_back(q, page, show_all, start_date_val):
+    async def go_back(q, page, show_all, start_date_val, sort_val, kategorie, ort, team, event_level, cursors, window):
         """Navigiert eine Seite zurück (sofern vorhanden) und clamped Page-Index.
-        Gibt gerenderte Markdown-Liste, Page-Info und die neue Seite zurück.
+        Kommt in der Regel aus dem Seitenfenster der Session (keine DB-Abfrage).
+        Gibt gerenderte Markdown-Liste, Page-Info, die neue Seite, die Cursor, das Fenster und Zurück/Weiter zurück.
         """
-        p = _clamp_page_for(q, max(1, page-1), show_all, start_date_val)
-        md, info, q2, p2 = search_page(q, p, show_all, start_date_val)
-        return md, info, p2
+        md, pager, p2, cursors, window = await show_page(q, max(1, page-1), show_all, start_date_val, cursors, window,
+                                                         _sort_value(sort_val), _facets(kategorie, ort, team, event_level))
+        return md, page_info_md(pager), p2, cursors, window, *nav_updates(pager)
 
-    def go_next(q, page, show_all, start_date_val):
+    async def go_next(q, page, show_all, start_date_val, sort_val, kategorie, ort, team, event_level, cursors, window):
         """Navigiert eine Seite vor (sofern vorhanden) und clamped Page-Index.
-        Gibt gerenderte Markdown-Liste, Page-Info und die neue Seite zurück.
+        Die Folgeseite ist meist schon vorgeladen (prefetch_page).
+        Gibt gerenderte Markdown-Liste, Page-Info, die neue Seite, die Cursor, das Fenster und Zurück/Weiter zurück.
         """
-        p = _clamp_page_for(q, page+1, show_all, start_date_val)
-        md, info, q2, p2 = search_page(q, p, show_all, start_date_val)
-        return md, info, p2
+        md, pager, p2, cursors, window = await show_page(q, page+1, show_all, start_date_val, cursors, window,
+                                                         _sort_value(sort_val), _facets(kategorie, ort, team, event_level))
+        return md, page_info_md(pager), p2, cursors, window, *nav_updates(pager)
 
     # ----- Handler: Clear Search -----
-    def clear_search_fn(show_all, start_date_val):
-        """Setzt Suchfeld und Seite zurück und lädt Standardliste (kommende Termine).
+    async def clear_search_fn(show_all, start_date_val, sort_val="Datum"):
+        """Setzt Suchfeld, Facetten und Seite zurück und lädt Standardliste (kommende Termine).
         Liefert außerdem einen leeren q_state, damit Navigation konsistent bleibt.
         """
-        md, info, _, _ = search_page("", 1, show_all, start_date_val)
-        return md, info, "", 1, ""
+        md, pager, _, cursors, window = await show_page("", 1, show_all, start_date_val, sort=_sort_value(sort_val))
+        return md, page_info_md(pager), "", 1, "", cursors, window, *nav_updates(pager), *([""] * len(FACET_COLUMNS))
+
+    # ----- Handler: Kalender-Export -----
+    async def export_ics(q, show_all, start_date_val, kategorie="", ort="", team="", event_level=""):
+        """Exportiert alle Treffer der aktuellen Suche (nicht nur die Seite) als .ics."""
+        try:
+            path = await export_ics_file(q, show_all, start_date_val, _facets(kategorie, ort, team, event_level))
+        except Exception as e:
+            print("[export_ics] error:", e)
+            return gr.update(value=None, visible=False)
+        return gr.update(value=path, visible=True)
 
     # ----- Hooks -----
-    suchfeld.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    show_all.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    start_date_inp.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-
-    back_btn.click(fn=go_back, inputs=[q_state, current_page, show_all, start_date_inp], outputs=[output_box, page_info, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    next_btn.click(fn=go_next, inputs=[q_state, current_page, show_all, start_date_inp], outputs=[output_box, page_info, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    clear_search.click(fn=clear_search_fn, inputs=[show_all, start_date_inp], outputs=[output_box, page_info, suchfeld, current_page, q_state]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
+    # Zurück/Weiter werden direkt mit dem Ergebnis aktualisiert (ein Roundtrip pro Aktion)
+    search_inputs = [suchfeld, show_all, start_date_inp, sort_inp, *facet_inputs]
+    search_outputs = [output_box, page_info, q_state, current_page, page_cursors, page_window, back_btn, next_btn]
+    nav_outputs = [output_box, page_info, current_page, page_cursors, page_window, back_btn, next_btn]
+    if SEARCH_DEBOUNCE_MS > 0:
+        # jede Eingabe wird abgeschickt ("multiple"), do_search_live entscheidet, welche zählt
+        suchfeld.change(fn=do_search_live, inputs=search_inputs, outputs=search_outputs, trigger_mode="multiple", concurrency_limit=CONCURRENCY_LIVE, show_progress="hidden")
+    else:
+        suchfeld.change(fn=do_search, inputs=search_inputs, outputs=search_outputs, concurrency_limit=CONCURRENCY_SEARCH, concurrency_id="search")
+    show_all.change(fn=do_search, inputs=search_inputs, outputs=search_outputs, concurrency_limit=CONCURRENCY_SEARCH, concurrency_id="search")
+    start_date_inp.change(fn=do_search, inputs=search_inputs, outputs=search_outputs, concurrency_limit=CONCURRENCY_SEARCH, concurrency_id="search")
+    sort_inp.change(fn=do_search, inputs=search_inputs, outputs=search_outputs, concurrency_limit=CONCURRENCY_SEARCH, concurrency_id="search")
+    for facet_inp in facet_inputs:
+        # .input statt .change: das Zurücksetzen per ❌ löst keine zweite Suche aus
+        facet_inp.input(fn=do_search, inputs=search_inputs, outputs=search_outputs, concurrency_limit=CONCURRENCY_SEARCH, concurrency_id="search")
+
+    back_btn.click(fn=go_back, inputs=[q_state, current_page, show_all, start_date_inp, sort_inp, *facet_inputs, page_cursors, page_window], outputs=nav_outputs, concurrency_limit=CONCURRENCY_NAV, concurrency_id="nav")
+    next_btn.click(fn=go_next, inputs=[q_state, current_page, show_all, start_date_inp, sort_inp, *facet_inputs, page_cursors, page_window], outputs=nav_outputs, concurrency_limit=CONCURRENCY_NAV, concurrency_id="nav")
+    clear_search.click(fn=clear_search_fn, inputs=[show_all, start_date_inp, sort_inp], outputs=[output_box, page_info, suchfeld, current_page, q_state, page_cursors, page_window, back_btn, next_btn, *facet_inputs], concurrency_limit=CONCURRENCY_NAV, concurrency_id="nav")
+    ics_btn.click(fn=export_ics, inputs=[q_state, show_all, start_date_inp, *facet_inputs], outputs=[ics_file], concurrency_limit=CONCURRENCY_NAV, concurrency_id="nav")
     #btn_refresh.click(usage_snapshot, inputs=[], outputs=[counter_today, counter_total], queue=False)
-    # ----- Initial Load -----
-    demo.load(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page])
 
     # ----- Tipp Init -----
-    def init_tipp():
-        """Lädt den 'Tipp des Tages' aus Supabase und zeigt optional einen CTA-Button.
+    async def init_tipp():
+        """Lädt den 'Tipp des Tages' (über den Tipp-Cache) und zeigt optional einen CTA-Button.
         Gibt zwei Komponenten-Updates zurück: Markdown-Inhalt und CTA-HTML.
         """
-        row = load_tipp(supabase)
-        if not row:
+        view = await load_tipp_view()
+        if not view:
             return gr.update(visible=False), gr.update(visible=False)
-        #md = f"""### Mein Tipp: {row['title']}
-        md = f"""### <span class="tipp-badge">Mein Tipp</span><span class="tipp-title">{row['title']}</span>
-
-{row.get('body', '') or ''}"""
-        btn = tipp_chip_html(row)
+        md, btn = view
         return gr.update(value=md, visible=True), gr.update(value=btn, visible=bool(btn))
 
-    demo.load(fn=init_tipp, outputs=[tipp_md, tipp_btn], queue=False)
+    # ----- Initial Load (Bootstrap) -----
+    async def bootstrap(q, show_all, start_date_val, sort_val, kategorie, ort, team, event_level, request: gr.Request):
+        """Zählt den Seitenaufruf (serverseitig, gebündelt) und lädt Besucherzähler,
+        Tipp des Tages, Facetten-Auswahl und die erste Ergebnisseite gleichzeitig;
+        alles kommt in einer Antwort – Wartezeit = langsamste Abfrage statt Summe.
+        """
+        count_pageview(request)
+        counters, tipp, facets, search = await asyncio.gather(
+            usage_snapshot_md(), init_tipp(), load_facet_counts(),
+            do_search(q, show_all, start_date_val, sort_val, kategorie, ort, team, event_level),
+            return_exceptions=True,
+        )
+        if isinstance(counters, Exception):
+            print("[bootstrap] counter error:", counters)
+            counters = ("**Besucher Heute:** –", "**Besucher Gesamt:** –")
+        if isinstance(tipp, Exception):
+            print("[bootstrap] tipp error:", tipp)
+            tipp = (gr.update(visible=False), gr.update(visible=False))
+        if isinstance(facets, Exception):
+            print("[bootstrap] facet error:", facets)
+            facets = {}
+        if isinstance(search, Exception):
+            raise search
+        facet_updates = [gr.update(choices=facet_choices(facets.get(col, []))) for col in FACET_COLUMNS]
+        return (*counters, *tipp, *facet_updates, *search)
+
+    demo.load(
+        fn=bootstrap,
+        inputs=search_inputs,
+        outputs=[counter_today, counter_total, tipp_md, tipp_btn, *facet_inputs, *search_outputs],
+        concurrency_limit=CONCURRENCY_SEARCH,
+        concurrency_id="search",
+    )
+
+# =============================
+# BLOCK 5 — HTTP-Routen (ICS) & Server
+# =============================
+# FastAPI-App mit eigenen Routen; Gradio wird darunter unter "/" gemountet.
+
+app = FastAPI()
+
+# ----- ICS-Feed (Abo-URL) -----
+# Kalender-Clients pollen Abo-URLs sehr oft. Der Feed wird deshalb je Filter
+# gecacht und nur neu gebaut, wenn sich die Events geändert haben:
+#   - innerhalb FEED_RECHECK_SECONDS: Antwort direkt aus dem Speicher (keine DB)
+#   - danach: Events laden, Fingerprint vergleichen; gleich -> alter Body/ETag
+# ETag = SHA-256 des Bodys (stark), dazu Last-Modified und 304-Antworten.
+feed_cache = TTLCache(maxsize=64, ttl=float("inf"))
+_feed_lock = asyncio.Lock()
+
+async def get_feed(facets: dict) -> dict:
+    """Feed-Eintrag {etag, last_modified, body, fingerprint, checked_at} für die Filter."""
+    key = tuple(sorted(facets.items()))
+    entry = feed_cache.get(key)
+    if entry is not MISSING and time.monotonic() - entry["checked_at"] < FEED_RECHECK_SECONDS:
+        return entry
+    async with _feed_lock:
+        entry = feed_cache.get(key)
+        if entry is not MISSING and time.monotonic() - entry["checked_at"] < FEED_RECHECK_SECONDS:
+            return entry
+        start = (datetime.fromisoformat(today_berlin()) - timedelta(days=FEED_PAST_DAYS)).date().isoformat()
+        rows = [ev async for ev in iter_matching_events("", True, start, facets)]
+        fingerprint = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if entry is not MISSING and entry["fingerprint"] == fingerprint:
+            entry = dict(entry, checked_at=time.monotonic())
+        else:
+            body = b"".join(iter_ics_calendar(rows))
+            entry = {
+                "fingerprint": fingerprint,
+                "body": body,
+                "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+                "last_modified": formatdate(usegmt=True),
+                "checked_at": time.monotonic(),
+            }
+        feed_cache.set(key, entry)
+        return entry
+
+def _not_modified(request: Request, etag: str, last_modified: str) -> bool:
+    """Conditional GET: If-None-Match hat Vorrang vor If-Modified-Since."""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return parsedate_to_datetime(ims) >= parsedate_to_datetime(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@app.get("/ics/feed.ics")
+async def ics_feed(request: Request, kategorie: str | None = None, ort: str | None = None, team: str | None = None,
+                   event_level: str | None = None):
+    """Abonnierbarer Kalender aller veröffentlichten Termine, optional gefiltert."""
+    facets = _facets(kategorie, ort, team, event_level)
+    try:
+        entry = await get_feed(facets)
+    except Exception as e:
+        print("[ics_feed] error:", e)
+        return Response(status_code=503, headers={"Retry-After": "60"})
+    headers = {
+        "ETag": entry["etag"],
+        "Last-Modified": entry["last_modified"],
+        "Cache-Control": f"public, max-age={int(FEED_RECHECK_SECONDS)}",
+    }
+    if _not_modified(request, entry["etag"], entry["last_modified"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+
+# ----- Einzel-ICS -----
+# Event-IDs: Ganzzahl oder UUID. Alles andere ist sicher kein Termin (404, ohne DB);
+# lehnt Postgres den Wert trotzdem ab (Typ/Bereich), ebenso 404 statt 503-Retry-Schleife.
+_EVENT_ID_RE = re.compile(r"\d{1,18}|[0-9a-fA-F]{8}-(?:[0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}")
+_INVALID_ID_CODES = ("22P02", "22003")   # invalid_text_representation, numeric_value_out_of_range
+
+@app.get("/ics/{ev_id}")
+async def ics_event(request: Request, ev_id: str):
+    """Ein Termin als .ics-Download (aus dem vorgewärmten LRU-Cache)."""
+    if not _EVENT_ID_RE.fullmatch(ev_id):
+        return Response(status_code=404)
+    try:
+        entry = await get_event_ics(ev_id)
+    except APIError as e:
+        if e.code in _INVALID_ID_CODES:
+            return Response(status_code=404)
+        print("[ics_event] error:", e)
+        return Response(status_code=503, headers={"Retry-After": "30"})
+    except Exception as e:
+        print("[ics_event] error:", e)
+        return Response(status_code=503, headers={"Retry-After": "30"})
+    if entry is None:
+        return Response(status_code=404)
+    headers = {
+        "ETag": entry["etag"],
+        "Cache-Control": f"public, max-age={int(ICS_CACHE_TTL)}",
+    }
+    if _not_modified(request, entry["etag"], ""):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{entry["filename"]}"'
+    return Response(content=entry["body"], media_type="text/calendar; charset=utf-8", headers=headers)
+
+# ----- Cache-Kennzahlen -----
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Größe und Trefferquote der Prozess-Caches (JSON, für Monitoring/Tuning)."""
+    return {
+        "card": card_cache.stats(),
+        "page_md": page_md_cache.stats(),
+        "search": search_cache.stats(),
+        "ics": ics_cache.stats(),
+        "feed": feed_cache.stats(),
+        "tipp": tipp_cache.stats(),
+        "facets": facet_cache.stats(),
+        "single_flight": {
+            "page": page_flight.stats(),
+            "tipp": tipp_flight.stats(),
+            "ics": ics_flight.stats(),
+            "facets": facet_flight.stats(),
+        },
+    }
+
+# ----- Gradio einhängen -----
+# Ab Gradio 6 setzt mount_gradio_app blocks.css = css und verwirft gr.Blocks(css=...);
+# ältere Versionen kennen den Parameter nicht und nehmen das CSS aus den Blocks.
+_mount_kwargs = {"css": CUSTOM_CSS} if "css" in inspect.signature(gr.mount_gradio_app).parameters else {}
+app = gr.mount_gradio_app(app, demo, path="/", **_mount_kwargs)
 
 if __name__ == "__main__":
-    # Für Deployment (Render, Docker etc.):
-    demo.launch(server_name="0.0.0.0", server_port=int(os.environ.get("PORT", 7860)))
+    cli = argparse.ArgumentParser(description=BROWSER_TITLE)
+    cli.add_argument("--import-ics", metavar="DATEI", help=".ics-Datei in die events-Tabelle übernehmen (statt Server zu starten)")
+    cli.add_argument("--publish", action="store_true", help="importierte Termine direkt freigeben (abgesagte nicht)")
+    args = cli.parse_args()
+
+    if args.import_ics:
+        # Bulk-Import: python events_app.py --import-ics termine.ics [--publish]
+        n = asyncio.run(import_ics_file(args.import_ics, publish=args.publish))
+        print(f"[ics-import] {n} Termine aus {args.import_ics} übernommen")
+    else:
+        # Für Deployment (Render, Docker etc.): FastAPI-App inkl. ICS-Routen + Gradio unter "/"
+        uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 7860)))
 
     # Für lokalen Test:
     #demo.launch()
@@ -1,5 +1,11 @@
 # ============================================================
-#  Events-Frontend
+#  Events-Frontend — ICS-Helfer
+#  V2.5 (2026-10-18) eigenständiges Hilfsmodul für events_app.py
+#    • ICS-Import: gestreamter Parser (mmap) -> Event-Dicts, Bulk-Upsert in events_app.py
+#    • RFC-5545-Zeilenfaltung (75 Oktette, UTF-8-sicher), Schreiber direkt ins bytearray
+#    • Dauer-Grammatik (parse_dauer): deutsche Freitext-Formen, LRU-gecacht
+#    • App-Kopie (Blöcke 1–4, Stand V2.4) entfernt – die App lebt in events_app.py
+#    • Batch-Export: mehrere VEVENTs in einer VCALENDAR, als Byte-Chunks gestreamt
 #  V2.4 (2025-08-24) neues Feld für Zielgruppe event_level mit CSS 
 #- v2.3 (2025-08-22) [KI+Kalli]
 #    • CSS komplett ins Hauptscript zurückgeführt
@@ -22,76 +28,15 @@
 #  Autoren: KI + Kalli
 # ============================================================
 
-# =============================
-# BLOCK 1 — Header & Setup
-# =============================
-
-# ----- Imports & Setup -----
+# ----- Imports -----
+import mmap
 import os
-import math
 import re
 from datetime import date, datetime
+from functools import lru_cache
+from itertools import islice
 from zoneinfo import ZoneInfo
 
-import gradio as gr
-from dotenv import load_dotenv
-from supabase import create_client
-
-# ----- App Version -----
-__APP_VERSION__ = "Frontend v2.4 (mit Zielgruppe)"
-
-# ----- Supabase Setup -----
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY") or os.getenv("SUPABASE_SERVICE_ROLE")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-# ----- Konstanten -----
-EVENTS_PER_PAGE = 6
-APP_TITLE = "Ein Service von Karl-Heinz -Kalli- Turban • Events & Termine der Alternative für Deutschland"
-LOGO_PATH = "assets/logo_160_80.png"
-
-# ----- Zeit / Datum -----
-def today_berlin() -> str:
-    try:
-        return datetime.now(ZoneInfo("Europe/Berlin")).date().isoformat()
-    except Exception:
-        return date.today().isoformat()
-
-# ----- CSS -----
-CUSTOM_CSS = """
-#footer, footer { display:none !important; }
-button[aria-label="Herunterladen"], button[aria-label="Vollbild"],
-button[title="Herunterladen"], button[title="Vollbild"],
-button[aria-label="Fullscreen"], button[title="Fullscreen"] { display:none !important; }
-
-.kalli-header { display:flex; align-items:center; gap:12px; padding:10px 12px;
-  border-radius:12px; background:#87CEEB; overflow-x:visible; white-space:normal; }
-.kalli-header::-webkit-scrollbar { display:none; }
-.kalli-header { scrollbar-width:none; }
-.kalli-title { font-weight:700; font-size:1.05rem; color:#000; }
-.kalli-subtitle { font-weight:500; font-size:0.9rem; opacity:0.8; }
-.kalli-actions { gap:12px; flex-wrap:wrap; }
-.kalli-actions .gr-button { flex: 1 1 200px; }
-.logo img { width:160px; height:80px; border-radius:10%; object-fit:cover; }
-.kalli-event-level { font-weight: bold; color: #555; margin-bottom: 6px; }
-
-@media print {
-  body * { visibility: hidden !important; }
-  #kalli-events, #kalli-events * { visibility: visible !important; }
-  #kalli-events { position: absolute !important; left: 0; top: 0; width: 100%;
-    padding: 0 !important; background: #fff !important; }
-
-  /* Filterleiste, Header, Aktionen komplett aus dem Layout entfernen */
-  .kalli-header, .kalli-actions, #filterbar { display: none !important; }
-  .kalli-header *, .kalli-actions *, #filterbar * { display: none !important; }
-
-  /* Sicherheitsnetz gegen Tooltips/Popover/Portals */
-  [role="tooltip"], [data-testid="tooltip"], .tooltip, .popover { display: none !important; }
-  #btn-clear { display: none !important; }
-}
-"""
-
 # =============================
 # BLOCK 1a — ICS-Helper
 # =============================
@@ -100,8 +45,13 @@ button[aria-label="Fullscreen"], button[title="Fullscreen"] { display:none !impo
 #ics_escape(text): RFC5545-Escapes für Summary/Location/Des#cription/URL.
 #to_utc_z(iso_ts): ISO → YYYYMMDDTHHMMSSZ in UTC.
 #derive_times_from_event(ev): robustes Start/Ende aus start_iso/end_iso oder aus datum/uhrzeit/dauer (Berlin-TZ, Default 120 min).
-#build_ics_event(ev, prodid=...): baut die .ics (ein VEVENT).
+#parse_dauer(dauer): Freitext-Dauer ("1,5 Std", "1h30", "19–21 Uhr", "ganztägig") -> Minuten, gecacht.
+#event_instants(ev): dasselbe als Zeitpunkte; derive_instants_bulk(events): DTSTART/DTEND für viele Events in einem Durchlauf.
+#build_ics_event(ev, prodid=...): baut die .ics (ein VEVENT), Zeilen RFC-konform bei 75 Oktetten gefaltet.
+#write_ics_vevent(buf, ev, dtstamp): schreibt ein VEVENT direkt in ein bytearray (Streaming-Schreiber).
+#iter_ics_calendar(events) / aiter_ics_calendar(events): eine .ics mit vielen VEVENTs, gestreamt.
 #ics_filename_for_event(ev): <slug>_<YYYY-MM-DD>.ics
+#iter_ics_vevents(path) / vevent_to_event(props): .ics-Datei (mmap, gestreamt) -> Event-Dicts fürs Schema (BLOCK 1b).
 # Diese Helfer bauen eine .ics (ein einzelnes VEVENT) für ein Event-Dict.
 # Sie sind bewusst unabhängig vom UI (Markdown/Buttons/Route), damit wir sie
 # überall wiederverwendbar nutzen können (HTTP-Route, Gradio-DownloadButton, Batch-Export).
@@ -120,14 +70,208 @@ def slugify(text: str) -> str:
 
 def ics_escape(text: str) -> str:
     """RFC5545-Escapes für Kommata, Semikolon, Backslash und Zeilenumbrüche."""
-    return (text or "").replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+    s = text or ""
+    if "\r" in s:
+        s = s.replace("\r\n", "\n").replace("\r", "\n")
+    return s.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+# ----- Zeitzonen & Dauer-Muster (einmal pro Modul statt pro Aufruf) -----
+TZ_BERLIN = ZoneInfo("Europe/Berlin")
+TZ_UTC = ZoneInfo("UTC")
+_INSTANT_MEMO_MAX = 4096   # Slots im Memo eines Batch-/Stream-Laufs
+
+def _utc_z(dt: datetime) -> str:
+    """tz-aware datetime -> YYYYMMDDTHHMMSSZ (ohne strftime)."""
+    u = dt.astimezone(TZ_UTC)
+    return "%04d%02d%02dT%02d%02d%02dZ" % (u.year, u.month, u.day, u.hour, u.minute, u.second)
 
 def to_utc_z(iso_ts: str) -> str:
     """ISO-String (mit/ohne TZ) -> UTC im Format YYYYMMDDTHHMMSSZ."""
     dt = datetime.fromisoformat(iso_ts)
     if dt.tzinfo is None:
         dt = dt.astimezone()  # lokale TZ annehmen (System)
-    return dt.astimezone(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
+    return _utc_z(dt)
+
+# ----- Dauer-Grammatik -----
+# Redaktionen schreiben die Dauer frei: "90 min", "2h", "1,5 Std", "1h30",
+# "1 Std. 15 Min.", "1:30 h", "19–21 Uhr", "19:30 bis 22 Uhr", "2 Tage",
+# "eineinhalb Stunden", "ganztägig". Alles wird auf Minuten normalisiert.
+DAUER_DEFAULT_MIN = 120
+_DAUER_CACHE_SIZE = 512    # distinct Rohwerte; Redaktionen nutzen wenige Phrasen
+_DAUER_WORDS = (
+    (re.compile(r"\b(?:eineinhalb|anderthalb)\b"), "1,5"),
+    (re.compile(r"\b(?:eine\s+)?(?:halbe|halben)\b"), "0,5"),
+    (re.compile(r"\b(?:eine|einer|ein)\b"), "1"),
+    (re.compile(r"\bzwei\b"), "2"),
+    (re.compile(r"\bdrei\b"), "3"),
+    (re.compile(r"\bvier\b"), "4"),
+)
+_DAUER_GANZTAG_RE = re.compile(r"ganzt[aä]g|ganzer\s+tag|all[\s-]?day")
+_DAUER_RANGE_RE = re.compile(
+    r"(\d{1,2})(?:[:.](\d{2}))?\s*(?:uhr\s*)?(?:-|bis)\s*(\d{1,2})(?:[:.](\d{2}))?\s*(uhr)?"
+)
+_DAUER_H_RE = re.compile(
+    r"(\d+(?:[.,]\d+)?)(?::(\d{2}))?\s*(?:stunden?|std|h)(?![a-zäöü])\.?"
+    r"(?:\s*(\d{1,2})\s*(?:minuten?|min|m|')(?![a-zäöü])|(\d{2})(?!\d))?"
+)
+_DAUER_MIN_RE = re.compile(r"(\d+)\s*(?:minuten?|min|m|')(?![a-zäöü])")
+_DAUER_TAGE_RE = re.compile(r"(\d+)\s*(?:tagen?|tage)(?![a-zäöü])")
+
+@lru_cache(maxsize=_DAUER_CACHE_SIZE)
+def _parse_dauer_cached(raw: str) -> tuple[bool, int | None]:
+    s = raw.strip().lower().replace("–", "-").replace("—", "-")
+    if not s:
+        return False, None
+    if _DAUER_GANZTAG_RE.search(s):
+        return True, None
+    for pat, repl in _DAUER_WORDS:
+        s = pat.sub(repl, s)
+
+    # Zeitspanne "19–21 Uhr" / "19:30-21:00": nur mit "Uhr" oder beidseitig HH:MM,
+    # damit "1-2 Std" nicht als Uhrzeit gelesen wird
+    r = _DAUER_RANGE_RE.search(s)
+    if r and (r.group(5) or (r.group(2) and r.group(4))):
+        h1, m1, h2, m2 = int(r.group(1)), int(r.group(2) or 0), int(r.group(3)), int(r.group(4) or 0)
+        if h1 < 24 and h2 <= 24 and m1 < 60 and m2 < 60:
+            mins = (h2 * 60 + m2) - (h1 * 60 + m1)
+            return False, mins if mins > 0 else mins + 24 * 60   # über Mitternacht
+
+    h = _DAUER_H_RE.search(s)
+    if h:
+        mins = round(float(h.group(1).replace(",", ".")) * 60)
+        mins += int(h.group(2) or h.group(3) or h.group(4) or 0)
+        if mins > 0:
+            return False, mins
+    m = _DAUER_MIN_RE.search(s)
+    if m and int(m.group(1)) > 0:
+        return False, int(m.group(1))
+    t = _DAUER_TAGE_RE.search(s)
+    if t and int(t.group(1)) > 0:
+        return False, int(t.group(1)) * 24 * 60
+    return False, None
+
+def parse_dauer(dauer) -> tuple[bool, int | None]:
+    """
+    Freitext-Dauer -> (ganztaegig, minuten).
+      "1,5 Std" -> (False, 90)   "19–21 Uhr" -> (False, 120)
+      "ganztägig" -> (True, None)   unbekannt -> (False, None)
+    Ergebnisse pro Rohstring gecacht (LRU, begrenzt).
+    """
+    if dauer is None:
+        return False, None
+    return _parse_dauer_cached(dauer if isinstance(dauer, str) else str(dauer))
+
+def _wall_slot(datum: str, uhr: str, dauer) -> tuple:
+    """
+    Herleitung aus datum/uhrzeit/dauer (Berliner Wandzeit):
+      (True, 'YYYY-MM-DD', None)        Ganztag
+      (False, naive start_dt, minuten)  Beginn + Dauer
+    """
+    if not (datum and uhr):
+        # Fallback: Ganztag des Datums
+        return True, datum, None
+
+    ganztag, minutes = parse_dauer(dauer)
+    if ganztag:
+        return True, datum, None
+
+    # Uhrzeit parsen (best effort)
+    try:
+        hh, mm = [int(x) for x in uhr.split(":")[:2]]
+    except Exception:
+        hh, mm = 9, 0
+    if not (0 <= hh <= 23 and 0 <= mm <= 59):   # z. B. "24:00" (gültig für Postgres time)
+        hh, mm = 9, 0
+    start = datetime(int(datum[:4]), int(datum[5:7]), int(datum[8:10]), hh, mm)
+    return False, start, minutes or DAUER_DEFAULT_MIN
+
+def _slot_key(ev: dict) -> tuple:
+    return (ev.get("datum") or "")[:10], (ev.get("uhrzeit") or "").strip(), ev.get("dauer")
+
+def event_instants(ev: dict) -> tuple:
+    """
+    Start/Ende eines Events als Zeitpunkte (die eine Herleitung für Anzeige und .ics).
+
+    Rückgabe:
+      (True,  'YYYY-MM-DD', 'YYYY-MM-DD')   Ganztag
+      (False, start_dt, end_dt)             tz-aware datetimes
+    """
+    start_iso = ev.get("start_iso")
+    end_iso   = ev.get("end_iso")
+    if start_iso and end_iso:
+        if len(start_iso) == 10 and len(end_iso) == 10:
+            return True, start_iso, end_iso
+        s_dt, e_dt = datetime.fromisoformat(start_iso), datetime.fromisoformat(end_iso)
+        return False, (s_dt if s_dt.tzinfo else s_dt.astimezone()), (e_dt if e_dt.tzinfo else e_dt.astimezone())
+
+    all_day, start, minutes = _wall_slot(*_slot_key(ev))
+    if all_day:
+        return True, start, start
+    start_dt = start.replace(tzinfo=TZ_BERLIN)
+    return False, start_dt, start_dt + timedelta(minutes=minutes)
+
+# ----- Batch: Wandzeit -> UTC in Minuten -----
+# Berlin wechselt den Offset nur an zwei Tagen im Jahr. Für alle anderen Tage
+# gilt ein fester Offset -> UTC = Wandzeit-Minute - Offset, formatiert aus
+# vorgefertigten Teilstrings; nur Umstellungstage gehen über zoneinfo.
+_HHMM_Z = tuple("T%02d%02d00Z" % divmod(i, 60) for i in range(24 * 60))
+
+@lru_cache(maxsize=1024)
+def _berlin_day_offset(day: int) -> int | None:
+    """Offset (Minuten) eines Tages (Ordinal) oder None am Umstellungstag."""
+    d0 = datetime.fromordinal(day)
+    o1, o2 = TZ_BERLIN.utcoffset(d0), TZ_BERLIN.utcoffset(d0 + timedelta(minutes=24 * 60 - 1))
+    return o1 // timedelta(minutes=1) if o1 == o2 else None
+
+@lru_cache(maxsize=1024)
+def _ordinal_ymd(day: int) -> str:
+    return date.fromordinal(day).strftime("%Y%m%d")
+
+def _wall_minute_utc_z(minute: int) -> str:
+    """Berliner Wandzeit (Minuten seit Ordinal-Tag 0) -> YYYYMMDDTHHMMSSZ."""
+    day, rest = divmod(minute, 24 * 60)
+    off = _berlin_day_offset(day)
+    if off is None:
+        return _utc_z(datetime.fromordinal(day).replace(tzinfo=TZ_BERLIN) + timedelta(minutes=rest))
+    day, rest = divmod(minute - off, 24 * 60)
+    return _ordinal_ymd(day) + _HHMM_Z[rest]
+
+def derive_instants_bulk(events, memo: dict | None = None) -> list[tuple[bool, str, str]]:
+    """
+    Start/Ende vieler Events in einem Durchlauf, als DTSTART/DTEND-Werte:
+      (True, 'YYYYMMDD', 'YYYYMMDD') oder (False, 'YYYYMMDDTHHMMSSZ', 'YYYYMMDDTHHMMSSZ').
+    Gleiche Slots (datum, uhrzeit, dauer) werden nur einmal hergeleitet;
+    memo (optional) hält die Slots über mehrere Aufrufe eines Streams.
+    """
+    slots = {} if memo is None else memo
+    out = []
+    for ev in events:
+        if ev.get("start_iso") and ev.get("end_iso"):
+            all_day, start, end = event_instants(ev)
+            if all_day:
+                out.append((True, start.replace("-", ""), end.replace("-", "")))
+            else:
+                out.append((False, _utc_z(start), _utc_z(end)))
+            continue
+        key = _slot_key(ev)
+        hit = slots.get(key)
+        if hit is None:
+            all_day, start, minutes = _wall_slot(*key)
+            if all_day:
+                d = start.replace("-", "")
+                hit = (True, d, d)
+            else:
+                m = start.toordinal() * 24 * 60 + start.hour * 60 + start.minute
+                hit = (False, _wall_minute_utc_z(m), _wall_minute_utc_z(m + minutes))
+            if len(slots) >= _INSTANT_MEMO_MAX:
+                slots.clear()
+            slots[key] = hit
+        out.append(hit)
+    return out
+
+def _ics_times(ev: dict, memo: dict | None = None) -> tuple[bool, str, str]:
+    """DTSTART/DTEND-Werte eines Events (derive_instants_bulk für ein Event)."""
+    return derive_instants_bulk((ev,), memo)[0]
 
 def derive_times_from_event(ev: dict) -> tuple[bool, str, str]:
     """
@@ -147,35 +291,103 @@ def derive_times_from_event(ev: dict) -> tuple[bool, str, str]:
     end_iso   = ev.get("end_iso")
     if start_iso and end_iso:
         return False, start_iso, end_iso
+    all_day, start, end = event_instants(ev)
+    if all_day:
+        return True, start, end
+    return False, start.isoformat(), end.isoformat()
+
+
+def ics_dtstamp() -> str:
+    """Aktueller Zeitstempel für DTSTAMP (UTC, YYYYMMDDTHHMMSSZ)."""
+    return _utc_z(datetime.now(TZ_UTC))
+
+# ----- Schreiber (RFC 5545, 3.1: Zeilen max. 75 Oktette, gefaltet) -----
+# Alles wird direkt in ein bytearray geschrieben; lange Zeilen werden beim
+# Schreiben gefaltet (CRLF + Leerzeichen), nie mitten in einem UTF-8-Zeichen.
+_CRLF = b"\r\n"
+_FOLD = b"\r\n "
+_LINE_MAX = 75
+
+def _write_line(buf: bytearray, data: bytes, used: int = 0) -> None:
+    """data als Inhaltszeile anhängen; used = schon geschriebene Oktette der Zeile."""
+    n = len(data)
+    limit = _LINE_MAX - used
+    if n <= limit:
+        buf += data
+        buf += _CRLF
+        return
+    if data.isascii():
+        # ASCII: jede Grenze ist gültig -> feste Schnitte
+        buf += data[:limit]
+        buf += _FOLD
+        buf += _FOLD.join([data[i:i + _LINE_MAX - 1] for i in range(limit, n, _LINE_MAX - 1)])
+        buf += _CRLF
+        return
+    mv = memoryview(data)
+    start = 0
+    while n - start > limit:
+        cut = start + limit
+        while cut > start and (data[cut] & 0xC0) == 0x80:   # UTF-8-Folgebyte
+            cut -= 1
+        if cut == start:   # Präfix füllt die Zeile schon, direkt falten
+            buf += _FOLD
+            limit = _LINE_MAX - 1
+            continue
+        buf += mv[start:cut]
+        buf += _FOLD
+        start = cut
+        limit = _LINE_MAX - 1   # Folgezeilen beginnen mit einem Leerzeichen
+    buf += mv[start:]
+    buf += _CRLF
+
+def _write_prop(buf: bytearray, name: bytes, value: str) -> None:
+    """NAME:value schreiben (name inkl. Parameter, ohne Doppelpunkt)."""
+    buf += name
+    buf += b":"
+    _write_line(buf, value.encode("utf-8"), len(name) + 1)
+
+def _write_calendar_head(buf: bytearray, prodid: str) -> None:
+    buf += b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\n"
+    _write_prop(buf, b"PRODID", prodid)
+    buf += b"CALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n"
+
+def write_ics_vevent(buf: bytearray, ev: dict, dtstamp: str, memo: dict | None = None,
+                     times: tuple | None = None) -> None:
+    """Ein VEVENT (BEGIN bis END) für ein Event-Dict in buf schreiben (times: aus derive_instants_bulk)."""
+    all_day, start, end = times or _ics_times(ev, memo)
 
-    datum = (ev.get("datum") or "")[:10]  # 'YYYY-MM-DD'
-    uhr   = (ev.get("uhrzeit") or "").strip()
-
-    if datum and uhr:
-        # Uhrzeit parsen (best effort)
-        try:
-            hh, mm = [int(x) for x in uhr.split(":")[:2]]
-        except Exception:
-            hh, mm = 9, 0
-        start_dt = datetime(
-            int(datum[:4]), int(datum[5:7]), int(datum[8:10]),
-            hh, mm, tzinfo=ZoneInfo("Europe/Berlin")
-        )
-        # Dauer erkennen (z. B. "90 min" oder "2h"); Default 120min
-        dur = (ev.get("dauer") or "").strip().lower()
-        mins = 120
-        m = re.search(r"(\d+)\s*(min|minute|minuten)", dur)
-        h = re.search(r"(\d+)\s*(h|std|stunde|stunden)", dur)
-        if h:
-            mins = int(h.group(1)) * 60
-        elif m:
-            mins = int(m.group(1))
-        end_dt = start_dt + timedelta(minutes=mins)
-        return False, start_dt.isoformat(), end_dt.isoformat()
-
-    # Fallback: Ganztag des Datums
-    return True, datum, datum
+    uid = f"{ev.get('id', 'unknown')}@kalli-events"
+    # Kopfzeilen haben feste, kurze Länge -> ein Block, ein encode
+    date_param = ";VALUE=DATE" if all_day else ""
+    # Hinweis Ganztag: RFC-konform wäre DTEND = Folgetag; das implementieren wir bei Bedarf.
+    if len(uid) <= _LINE_MAX - 4 and uid.isascii():
+        buf += (
+            f"BEGIN:VEVENT\r\nUID:{uid}\r\nDTSTAMP:{dtstamp}\r\n"
+            f"DTSTART{date_param}:{start}\r\nDTEND{date_param}:{end}\r\n"
+        ).encode("ascii")
+    else:
+        buf += b"BEGIN:VEVENT\r\n"
+        _write_prop(buf, b"UID", uid)
+        buf += f"DTSTAMP:{dtstamp}\r\nDTSTART{date_param}:{start}\r\nDTEND{date_param}:{end}\r\n".encode("ascii")
+
+    summary  = ev.get("titel") or ev.get("title") or "Termin"
+    # Ort nur, wenn er auch auf der Karte steht (show_location, wie format_event_card)
+    location = (ev.get("ort") or "") if bool(ev.get("show_location", True)) else ""
+    desc     = ev.get("beschreibung") or ""
+    url      = ev.get("link") or ev.get("pdf_url") or ""
 
+    s_b = ics_escape(summary).encode("utf-8")
+    l_b = ics_escape(location).encode("utf-8")
+    d_b = ics_escape(desc).encode("utf-8")
+    u_b = ics_escape(url).encode("utf-8")
+    if len(s_b) <= 67 and len(l_b) <= 66 and len(d_b) <= 63 and len(u_b) <= 71:
+        # Häufigster Fall: nichts zu falten -> ein Format, ein Append
+        buf += b"SUMMARY:%b\r\nLOCATION:%b\r\nDESCRIPTION:%b\r\nURL:%b\r\nEND:VEVENT\r\n" % (s_b, l_b, d_b, u_b)
+        return
+    for prefix, data in ((b"SUMMARY:", s_b), (b"LOCATION:", l_b), (b"DESCRIPTION:", d_b), (b"URL:", u_b)):
+        buf += prefix
+        _write_line(buf, data, len(prefix))
+    buf += b"END:VEVENT\r\n"
 
 def build_ics_event(ev: dict, *, prodid: str = "-//Kalli Events//DE") -> bytes:
     """
@@ -186,55 +398,63 @@ def build_ics_event(ev: dict, *, prodid: str = "-//Kalli Events//DE") -> bytes:
       - titel / title
       - datum (YYYY-MM-DD)
       - uhrzeit (optional, HH:MM)
-      - dauer (optional, z. B. "90 min", "2h")
-      - ort, beschreibung, link/pdf_url (optional)
+      - dauer (optional, z. B. "90 min", "2h", "1,5 Std", "19–21 Uhr")
+      - ort, beschreibung, link/pdf_url (optional; ort entfällt bei show_location=False)
       - optional: start_iso, end_iso (ISO 8601, mit/ohne TZ)
 
-    Rückgabe: bytes der .ics (UTF-8, CRLF-Zeilenenden).
+    Rückgabe: bytes der .ics (UTF-8, CRLF-Zeilenenden, bei 75 Oktetten gefaltet).
     """
-    uid = f"{ev.get('id', 'unknown')}@kalli-events"
-    now = datetime.now(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
-
-    all_day, start_repr, end_repr = derive_times_from_event(ev)
-
-    lines: list[str] = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        f"PRODID:{prodid}",
-        "CALSCALE:GREGORIAN",
-        "METHOD:PUBLISH",
-        "BEGIN:VEVENT",
-        f"UID:{uid}",
-        f"DTSTAMP:{now}",
-    ]
-
-    if all_day or (len(start_repr) == 10 and len(end_repr) == 10):
-        # Hinweis: RFC-konform wäre DTEND = Folgetag; das implementieren wir bei Bedarf.
-        lines += [
-            f"DTSTART;VALUE=DATE:{start_repr.replace('-', '')}",
-            f"DTEND;VALUE=DATE:{end_repr.replace('-', '')}",
-        ]
-    else:
-        lines += [
-            f"DTSTART:{to_utc_z(start_repr)}",
-            f"DTEND:{to_utc_z(end_repr)}",
-        ]
-
-    summary  = ev.get("titel") or ev.get("title") or "Termin"
-    location = ev.get("ort") or ""
-    desc     = ev.get("beschreibung") or ""
-    url      = ev.get("link") or ev.get("pdf_url") or ""
-
-    lines += [
-        f"SUMMARY:{ics_escape(summary)}",
-        f"LOCATION:{ics_escape(location)}",
-        f"DESCRIPTION:{ics_escape(desc)}",
-        f"URL:{ics_escape(url)}",
-        "END:VEVENT",
-        "END:VCALENDAR",
-        "",
-    ]
-    return "\r\n".join(lines).encode("utf-8")
+    buf = bytearray()
+    _write_calendar_head(buf, prodid)
+    write_ics_vevent(buf, ev, ics_dtstamp())
+    buf += ICS_CALENDAR_TAIL
+    return bytes(buf)
+
+# ----- Batch-Export (mehrere VEVENTs) -----
+# Eine VCALENDAR für beliebig viele Events, als Generator von Byte-Chunks:
+# Kopf + DTSTAMP einmal, VEVENTs laufen in einen Puffer, der ab
+# ICS_STREAM_CHUNK_BYTES als ein Chunk rausgeht -> konstanter Speicher,
+# wenige große Writes statt einem pro Event. Start/Ende kommen blockweise
+# aus derive_instants_bulk.
+
+ICS_CALENDAR_TAIL = b"END:VCALENDAR\r\n"
+ICS_STREAM_CHUNK_BYTES = 64 * 1024
+ICS_STREAM_BATCH = 256     # Events je derive_instants_bulk-Aufruf im Stream
+
+def iter_ics_calendar(events, *, prodid: str = "-//Kalli Events//DE"):
+    """Streamt eine VCALENDAR mit allen Events aus einem (sync) Iterable."""
+    dtstamp, memo = ics_dtstamp(), {}
+    buf = bytearray()
+    _write_calendar_head(buf, prodid)
+    it = iter(events)
+    while batch := list(islice(it, ICS_STREAM_BATCH)):
+        for ev, times in zip(batch, derive_instants_bulk(batch, memo)):
+            write_ics_vevent(buf, ev, dtstamp, times=times)
+        if len(buf) >= ICS_STREAM_CHUNK_BYTES:
+            yield bytes(buf)
+            buf.clear()
+    buf += ICS_CALENDAR_TAIL
+    yield bytes(buf)
+
+async def aiter_ics_calendar(events, *, prodid: str = "-//Kalli Events//DE"):
+    """Wie iter_ics_calendar, für async Iterables (z. B. seitenweise DB-Abfrage)."""
+    dtstamp, memo = ics_dtstamp(), {}
+    buf = bytearray()
+    _write_calendar_head(buf, prodid)
+    batch = []
+    async for ev in events:
+        batch.append(ev)
+        if len(batch) >= ICS_STREAM_BATCH:
+            for b_ev, times in zip(batch, derive_instants_bulk(batch, memo)):
+                write_ics_vevent(buf, b_ev, dtstamp, times=times)
+            batch.clear()
+            if len(buf) >= ICS_STREAM_CHUNK_BYTES:
+                yield bytes(buf)
+                buf.clear()
+    for b_ev, times in zip(batch, derive_instants_bulk(batch, memo)):
+        write_ics_vevent(buf, b_ev, dtstamp, times=times)
+    buf += ICS_CALENDAR_TAIL
+    yield bytes(buf)
 
 def ics_filename_for_event(ev: dict) -> str:
     """Hübscher Dateiname: <slug>_<YYYY-MM-DD>.ics"""
@@ -243,120 +463,167 @@ def ics_filename_for_event(ev: dict) -> str:
     return f"{slugify(title)}_{date_}.ics"
 
 # =============================
-# BLOCK 2 — Tipp-Bereich & Event-Card Rendering
+# BLOCK 1b — ICS-Import (Parser)
 # =============================
-
-# ----- Tipp-Helpers -----
-def _public_url(res):
-    if isinstance(res, str):
-        return res
-    if isinstance(res, dict):
-        return res.get("publicUrl") or res.get("data", {}).get("publicUrl", "")
-    return ""
-
-# ----- Tipp laden -----
-def load_tipp(sb):
-    today = today_berlin()
+# Liest .ics-Dateien beliebiger Größe: Datei per mmap, Zeilen werden beim
+# Lesen entfaltet, VEVENTs einzeln als Generator geliefert -> Speicher ~ ein Event.
+# vevent_to_event() bildet ein VEVENT auf das events-Schema ab
+# (titel, datum, uhrzeit, dauer, ort, kategorie, beschreibung, link, ics_uid).
+# Wiederholungen (RRULE) werden nicht expandiert: übernommen wird der erste Termin.
+
+_ICS_UNESCAPE_RE = re.compile(r"\\([\\;,nN])")
+_ICS_UNESCAPES = {"\\": "\\", ";": ";", ",": ",", "n": "\n", "N": "\n"}
+_ICS_LIST_SPLIT_RE = re.compile(r"(?<!\\),")
+_ICS_DURATION_RE = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+def ics_unescape(text: str) -> str:
+    """Umkehrung von ics_escape (\\n, \\, \\; \\\\)."""
+    if not text or "\\" not in text:
+        return text or ""
+    return _ICS_UNESCAPE_RE.sub(lambda m: _ICS_UNESCAPES[m[1]], text)
+
+def _iter_unfolded(mm):
+    """Logische Zeilen aus einem mmap/Binärstrom; Faltungen werden auf Byte-Ebene
+    zusammengesetzt (Faltung kann mitten in einem UTF-8-Zeichen liegen)."""
+    pending = None
+    for raw in iter(mm.readline, b""):
+        line = raw.rstrip(b"\r\n")
+        if line[:1] in (b" ", b"\t"):
+            if pending is not None:
+                pending += line[1:]
+            continue
+        if pending:
+            yield pending.decode("utf-8", "replace")
+        pending = line
+    if pending:
+        yield pending.decode("utf-8", "replace")
+
+def _split_content_line(line: str) -> tuple[str, dict, str]:
+    """'DTSTART;TZID=Europe/Berlin:20250901T190000' -> ('DTSTART', {'TZID': ...}, '20250901T190000')."""
+    i = line.find(":")
+    if i < 0:
+        return line.upper(), {}, ""
+    if '"' in line[:i]:
+        # Doppelpunkt in einem Parameter in Anführungszeichen -> genau suchen
+        quoted = False
+        for i, ch in enumerate(line):
+            if ch == '"':
+                quoted = not quoted
+            elif ch == ":" and not quoted:
+                break
+    head, value = line[:i], line[i + 1:]
+    name, *raw_params = head.split(";")
+    params = {}
+    for p in raw_params:
+        k, _, v = p.partition("=")
+        params[k.upper()] = v.strip('"')
+    return name.upper(), params, value
+
+def _iter_vevent_props(lines):
+    """Eigenschaften je VEVENT: {NAME: (params, value)}; verschachtelte
+    Komponenten (VALARM) werden übersprungen, mehrfache CATEGORIES verbunden."""
+    stack: list[str] = []
+    props: dict = {}
+    for line in lines:
+        name, params, value = _split_content_line(line)
+        if name == "BEGIN":
+            stack.append(value.upper())
+            if stack[-1] == "VEVENT":
+                props = {}
+        elif name == "END":
+            comp = stack.pop() if stack else ""
+            if comp == "VEVENT":
+                yield props
+        elif stack and stack[-1] == "VEVENT":
+            if name == "CATEGORIES" and name in props:
+                props[name] = (params, props[name][1] + "," + value)
+            elif name not in props:
+                props[name] = (params, value)
+
+def iter_ics_vevents(path):
+    """Generator über die VEVENT-Eigenschaften einer .ics-Datei (memory-mapped)."""
+    with open(path, "rb") as fh:
+        if os.fstat(fh.fileno()).st_size == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _iter_vevent_props(_iter_unfolded(mm))
+
+@lru_cache(maxsize=64)
+def _ics_zone(tzid: str | None):
+    # Unbekannte TZIDs (z. B. Outlook "W. Europe Standard Time") -> Berlin
+    if not tzid:
+        return TZ_BERLIN
     try:
-        data = (sb.table("site_news_tipp").select("*")
-                .eq("published", True)
-                .lte("valid_from", today)
-                .or_(f"valid_to.gte.{today},valid_to.is.null")
-                .order("valid_from", desc=True)
-                .order("created_at", desc=True)
-                .limit(1)
-                .execute()).data
-        return data[0] if data else None
+        return ZoneInfo(tzid)
     except Exception:
+        return TZ_BERLIN
+
+def _ics_instant(params: dict, value: str):
+    """DATE -> date; DATE-TIME (UTC, TZID oder floating) -> datetime in Berlin."""
+    v = value.strip()
+    if params.get("VALUE", "").upper() == "DATE" or len(v) == 8:
+        return date(int(v[:4]), int(v[4:6]), int(v[6:8]))
+    dt = datetime(int(v[:4]), int(v[4:6]), int(v[6:8]), int(v[9:11]), int(v[11:13]), int(v[13:15] or 0))
+    tz = TZ_UTC if v.endswith("Z") else _ics_zone(params.get("TZID"))
+    return dt.replace(tzinfo=tz).astimezone(TZ_BERLIN)
+
+def _ics_duration_minutes(value: str) -> int | None:
+    m = _ICS_DURATION_RE.match((value or "").strip())
+    if not m:
         return None
+    w, d, h, mi, sec = (int(x or 0) for x in m.groups()[1:])
+    mins = ((w * 7 + d) * 24 + h) * 60 + mi + sec // 60
+    return -mins if m.group(1) == "-" else mins
 
-# ----- CTA URL Resolver -----
-def resolve_cta_url(row):
-    kind = (row.get("cta_kind") or "").lower()
-    if kind == "external":
-        return row.get("cta_url") or ""
-    if kind == "storage":
-        b, p = row.get("storage_bucket"), row.get("storage_path")
-        if not (b and p):
-            return ""
-        return _public_url(supabase.storage.from_(b).get_public_url(p))
-    return ""
-
-# ----- Tipp Chip HTML -----
-def tipp_chip_html(row):
-    if not row:
-        return ""
-    url = resolve_cta_url(row)
-    if not url:
-        return ""
-    label = (row.get("cta_label") or "Mehr Infos") + " ↗"
-    return f'<a href="{url}" target="_blank" rel="noopener" style="display:inline-block;padding:8px 12px;border:1px solid #888;border-radius:999px;text-decoration:none;font-weight:600;">💡 {label}</a>'
-
-# ----- Event-Karte Rendering -----
-
-def format_event_card(event: dict) -> str:
-    titel = event.get("titel", "") or ""
-    datum = event.get("datum", "") or ""
-    uhrzeit = event.get("uhrzeit", "") or ""
-    dauer = event.get("dauer", "") or ""
-    ort = event.get("ort", "") or ""
-    kategorie = event.get("kategorie", "") or ""
-    beschreibung = event.get("beschreibung", "") or ""
-    level = (event.get("event_level") or "").strip()
-    #level_line = f"🟢 Offenes Event? *{level}*" if level else ""
-    level_html = f'<div class="kalli-event-level">🟢 Offenes Event? <strong>{level}</strong></div>' if level else ""
-    link = event.get("link")
-    pdf_url = event.get("pdf_url")
-    requires_registration = bool(event.get("requires_registration") or False)
-    email_contact = (event.get("email_contact") or "").strip()
-    show_location = bool(event.get("show_location", True))
-    email_questions = (event.get("email_questions") or "").strip()
-
-    registration_block = ""
-    if requires_registration:
-        if email_contact:
-            registration_block = f"**✍️ Anmeldung:** [{email_contact}](mailto:{email_contact})"
-        else:
-            registration_block = f"**✍️ Anmeldung erforderlich**"
+def _format_dauer(minutes: int) -> str:
+    # Schreibweise wie in der Redaktion üblich ("2h", "90 min"); parse_dauer liest beides
+    return f"{minutes // 60}h" if minutes % 60 == 0 else f"{minutes} min"
 
-    meta_line = f"🗓️ {datum}"
-    if uhrzeit:
-        meta_line += f" ⏰ {uhrzeit}"
-    if dauer:
-        meta_line += f" ({dauer})"
-
-    location_line = f"📍 {ort}" if (show_location and ort) else ""
-    if kategorie:
-        location_line = (location_line + " | " if location_line else "") + f"Kategorie: {kategorie}"
-
-    link_block = f"🔗 [Mehr erfahren]({link})" if link else ""
-    pdf_block = f"📄 [PDF anzeigen]({pdf_url})" if pdf_url else ""
-
-    footer_parts = []
-    if registration_block:
-        footer_parts.append(registration_block)
-    if email_questions:
-        footer_parts.append(f"📧 Fragen: [{email_questions}](mailto:{email_questions})")
-    if link_block:
-        footer_parts.append(link_block)
-    if pdf_block:
-        footer_parts.append(pdf_block)
-
-    footer_line = "  |  ".join(footer_parts) if footer_parts else ""
-
-    md = f"""
-### 📌 {titel}
-{level_html}
-{meta_line}  
-
-{location_line}
-
-{beschreibung}
+def vevent_to_event(props: dict) -> dict | None:
+    """
+    VEVENT-Eigenschaften -> Event-Dict im Schema der events-Tabelle.
+    Ohne (lesbares) DTSTART: None. Zusatzfeld ics_status (CONFIRMED/CANCELLED/...)
+    bleibt dem Aufrufer überlassen (z. B. für published).
+    """
+    def val(name: str) -> str:
+        return ics_unescape(props[name][1]) if name in props else ""
 
-{footer_line}
-""".strip("\n")
-    return md
+    if "DTSTART" not in props:
+        return None
+    try:
+        start = _ics_instant(*props["DTSTART"])
+        end = _ics_instant(*props["DTEND"]) if "DTEND" in props else None
+    except (ValueError, IndexError):
+        return None
 
+    if isinstance(start, datetime):
+        datum, uhrzeit = start.date().isoformat(), f"{start.hour:02d}:{start.minute:02d}"
+        if isinstance(end, datetime):
+            minutes = int((end - start).total_seconds() // 60)
+        else:
+            minutes = _ics_duration_minutes(props.get("DURATION", ({}, ""))[1])
+        dauer = _format_dauer(minutes) if minutes and minutes > 0 else ""
+    else:
+        datum, uhrzeit = start.isoformat(), ""
+        days = (end - start).days if isinstance(end, date) and not isinstance(end, datetime) else 1
+        dauer = "ganztägig" if days <= 1 else f"{days} Tage"
+
+    titel = val("SUMMARY").strip() or "Termin"
+    cats = [ics_unescape(c).strip() for c in _ICS_LIST_SPLIT_RE.split(props["CATEGORIES"][1])] if "CATEGORIES" in props else []
+    return {
+        "ics_uid": val("UID").strip() or f"{slugify(titel)}-{datum}{uhrzeit.replace(':', '')}@import",
+        "titel": titel,
+        "datum": datum,
+        "uhrzeit": uhrzeit,
+        "dauer": dauer,
+        "ort": val("LOCATION"),
+        "kategorie": ", ".join(c for c in cats if c),
+        "beschreibung": val("DESCRIPTION"),
+        "link": val("URL") or None,
+        "ics_status": val("STATUS").strip().upper(),
+    }
+
+# ----- Karten-Link (Vorlage für /ics/{id}) -----
 #BASE_PATH = ""  # ggf. später "/events" o.ä.
 #def format_event_card(e: dict) -> str:
 #    md = ""  # ...dein bisheriges Karten-Markdown (Titel, Zeit, Ort, Links)...
@@ -372,203 +639,3 @@ def format_event_card(event: dict) -> str:
 #    # Optional: ID sichtbar (nur zu Debug-Zwecken)
 #    md += f"\n\n<small>ID: <code>{e['id']}</code></small>"
 #    return md
-
-
-
-# =============================
-# BLOCK 3 — DB Suche & Pagination
-# =============================
-
-# ----- Tokenizer -----
-def _tokens(q: str):
-    return [t for t in re.split(r"\s+", (q or '').strip()) if t]
-
-# ----- Suche Seite -----
-def search_page(query: str, page: int, show_all: bool, start_date_val: str | None):
-    try:
-        tbl = supabase.table("events").select("*", count="exact").eq("published", True)
-        start = (start_date_val or "").strip() if start_date_val else None
-        if not start and not show_all:
-            start = today_berlin()
-        if start:
-            tbl = tbl.gte("datum", start[:10])
-        for t in _tokens(query):
-            ilike = f"%{t}%"
-            tbl = tbl.or_("titel.ilike.{},kategorie.ilike.{},beschreibung.ilike.{},ort.ilike.{},status.ilike.{},team.ilike.{}".format(ilike, ilike, ilike, ilike, ilike, ilike))
-        tbl = tbl.order("datum", desc=False)
-        start_idx = max(0, (max(1, page) - 1) * EVENTS_PER_PAGE)
-        end_idx = start_idx + EVENTS_PER_PAGE - 1
-        # → sagt: nimm die Tabelle events, hol alle Spalten, zähl mit (count="exact") und filtere nur published = True.
-        res = tbl.range(start_idx, end_idx).execute()
-        # >>> IDs der aktuellen Seite extrahieren
-        ids = [ev["id"] for ev in (res.data or [])]
-        print("Aktuelle Event-IDs:", ids)   # Debug ins Terminal
-        # später geben wir diese IDs zusätzlich zurück (event_ids_state)
-        data, total = res.data or [], res.count or 0
-        pages = max(1, math.ceil(total / EVENTS_PER_PAGE))
-        page = min(max(1, page), pages)
-        md = "\n\n---\n\n".join([format_event_card(e) for e in data]) if data else "Keine passenden Termine."
-        return md, f"**{total} Treffer** · Seite {page}/{pages}", query, page
-    except Exception as e:
-        return f"⚠️ Fehler bei der Suche: {e}\n\nBitte versuche es erneut oder setze die Filter zurück.", "**0 Treffer** · Seite 1/1", query, 1
-
-# ----- Navigation Update -----
-def update_nav_from_info(info: str):
-    m = re.search(r"Seite\s+(\d+)\s*/\s*(\d+)", info or "")
-    if not m:
-        return gr.update(visible=False), gr.update(visible=False)
-    page, pages = int(m.group(1)), int(m.group(2))
-    return gr.update(visible=page > 1), gr.update(visible=page < pages)
-
-# ----- Clamp Page -----
-def _clamp_page_for(q, page, show_all, start_date_val):
-    cq = supabase.table("events").select("id", count="exact").eq("published", True)
-    start = (start_date_val or "").strip() if start_date_val else None
-    if not start and not show_all:
-        start = today_berlin()
-    if start:
-        cq = cq.gte("datum", start[:10])
-    for t in _tokens(q):
-        ilike = f"%{t}%"
-        cq = cq.or_("titel.ilike.{},kategorie.ilike.{},beschreibung.ilike.{},ort.ilike.{},status.ilike.{},team.ilike.{}".format(ilike, ilike, ilike, ilike, ilike, ilike))
-    total = (cq.execute().count or 0)
-    pages = max(1, math.ceil(total / EVENTS_PER_PAGE)) if total > 0 else 1
-    return min(max(1, page), pages)
-
-# =============================
-# BLOCK 4 — UI & Handlers
-# =============================
-
-with gr.Blocks(css=CUSTOM_CSS, title=f"{APP_TITLE} · {__APP_VERSION__}") as demo:
-    # ----- Header -----
-    with gr.Row(elem_classes="kalli-header"):
-        if os.path.exists(LOGO_PATH):
-            #gr.Image(LOGO_PATH, show_label=False, height=40, width=40, container=False)
-            gr.Image(LOGO_PATH, show_label=False, container=False, elem_classes="logo")
-
-        gr.HTML(f"<div><div class='kalli-title'>{APP_TITLE}</div><div class='kalli-subtitle'>{__APP_VERSION__}</div></div>")
-
-    # ----- Tipp des Tages -----
-    with gr.Row():
-        tipp_md = gr.Markdown(visible=False)
-        tipp_btn = gr.HTML(visible=False)
-    gr.HTML('<div style="height:1px;background:#3a3a3a;margin:8px 0 14px;border-radius:1px;"></div>')
-
-
- # Optional: Ticker (Platzhalter)
-   # with gr.Row(elem_classes="ticker-row"):
-   #     gr.HTML(
-   #         "<div>Aktuelle Hinweise: Termine können sich kurzfristig ändern. Angaben daher ohne Gewähr!"
-   #     )
-
-    # ----- Section: Veranstaltungen -----
-    gr.Markdown("## Veranstaltungen -Teilnehmerkreis beachten - Angaben ohne Gewähr!")
-
-    # ----- Filterleiste -----
-    with gr.Row(elem_id="filterbar"):
-        suchfeld = gr.Textbox(label="🔎 Suche", placeholder="z. B. Stammtisch, Infostand … (min. 2 Zeichen)")
-        #clear_search = gr.Button("❌", elem_id="btn-clear", scale=0, min_width=48)
-        show_all = gr.Checkbox(label="Alle Termine zeigen", value=False)
-        start_date_inp = gr.DateTime(label="Ab Datum", include_time=False, type="string", info="leer = Standard (nur kommende)")
-
-    # ----- Navigation & Print -----
-    with gr.Row(elem_classes="kalli-actions"):
-        clear_search = gr.Button("❌", elem_id="btn-clear", scale=0, min_width=48)
-        back_btn = gr.Button("⬅️ Zurück")
-        next_btn = gr.Button("Weiter ➡️")
-        print_btn = gr.Button("🖨 Drucken", elem_id="btn-print")
-
-    print_evt = print_btn.click(fn=lambda: None, inputs=None, outputs=None, queue=False)
-    print_evt.then(
-        fn=None,
-        js="try{if(document.activeElement){document.activeElement.blur();}}catch(e){} window.print();",
-        queue=False
-    )
-
-    # Fallback: direkter JS-Listener am Button (manche Gradio-Builds droppen js= am Event)
-    demo.load(
-        fn=None,
-        js="(()=>{const el=document.getElementById('btn-print');if(!el)return;el.addEventListener('click',()=>{try{if(document.activeElement){document.activeElement.blur();}}catch(e){} window.print();},{once:false});})()",
-        queue=False
-    )
-
-    # ----- Outputs -----
-    page_info = gr.Markdown()
-    output_box = gr.Markdown(elem_id="kalli-events")
-    q_state = gr.State("")
-    current_page = gr.State(1)
-
-    # ----- Handler: do_search -----
-    def do_search(q, show_all, start_date_val):
-        """Search handler.
-        Normalisiert die Query (min. 2 Zeichen), ruft die Datenabfrage auf
-        und setzt gleichzeitig den internen Zustand (q_state, current_page).
-        """
-        qs = (q or "").strip()
-        if qs and len(qs) < 2:
-            md, info, _, _ = search_page("", 1, show_all, start_date_val)
-            return md, info, "", 1
-        md, info, _, _ = search_page(qs, 1, show_all, start_date_val)
-        return md, info, qs, 1
-
-    # ----- Handler: Navigation -----
-    def go_back(q, page, show_all, start_date_val):
-        """Navigiert eine Seite zurück (sofern vorhanden) und clamped Page-Index.
-        Gibt gerenderte Markdown-Liste, Page-Info und die neue Seite zurück.
-        """
-        p = _clamp_page_for(q, max(1, page-1), show_all, start_date_val)
-        md, info, q2, p2 = search_page(q, p, show_all, start_date_val)
-        return md, info, p2
-
-    def go_next(q, page, show_all, start_date_val):
-        """Navigiert eine Seite vor (sofern vorhanden) und clamped Page-Index.
-        Gibt gerenderte Markdown-Liste, Page-Info und die neue Seite zurück.
-        """
-        p = _clamp_page_for(q, page+1, show_all, start_date_val)
-        md, info, q2, p2 = search_page(q, p, show_all, start_date_val)
-        return md, info, p2
-
-    # ----- Handler: Clear Search -----
-    def clear_search_fn(show_all, start_date_val):
-        """Setzt Suchfeld und Seite zurück und lädt Standardliste (kommende Termine).
-        Liefert außerdem einen leeren q_state, damit Navigation konsistent bleibt.
-        """
-        md, info, _, _ = search_page("", 1, show_all, start_date_val)
-        return md, info, "", 1, ""
-
-    # ----- Hooks -----
-    suchfeld.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    show_all.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    start_date_inp.change(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-
-    back_btn.click(fn=go_back, inputs=[q_state, current_page, show_all, start_date_inp], outputs=[output_box, page_info, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    next_btn.click(fn=go_next, inputs=[q_state, current_page, show_all, start_date_inp], outputs=[output_box, page_info, current_page]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-    clear_search.click(fn=clear_search_fn, inputs=[show_all, start_date_inp], outputs=[output_box, page_info, suchfeld, current_page, q_state]).then(fn=update_nav_from_info, inputs=[page_info], outputs=[back_btn, next_btn])
-
-    # ----- Initial Load -----
-    demo.load(fn=do_search, inputs=[suchfeld, show_all, start_date_inp], outputs=[output_box, page_info, q_state, current_page])
-
-    # ----- Tipp Init -----
-    def init_tipp():
-        """Lädt den 'Tipp des Tages' aus Supabase und zeigt optional einen CTA-Button.
-        Gibt zwei Komponenten-Updates zurück: Markdown-Inhalt und CTA-HTML.
-        """
-        row = load_tipp(supabase)
-        if not row:
-            return gr.update(visible=False), gr.update(visible=False)
-        # md = f"""### {row['title']}
-        md = f"""### Mein Tipp: {row['title']}
-
-
-{row.get('body', '') or ''}"""
-        btn = tipp_chip_html(row)
-        return gr.update(value=md, visible=True), gr.update(value=btn, visible=bool(btn))
-
-    demo.load(fn=init_tipp, outputs=[tipp_md, tipp_btn], queue=False)
-
-if __name__ == "__main__":
-    # Für Deployment (Render, Docker etc.):
-    #demo.launch(server_name="0.0.0.0", server_port=int(os.environ.get("PORT", 7860)))
-
-    # Für lokalen Test:
-    demo.launch()
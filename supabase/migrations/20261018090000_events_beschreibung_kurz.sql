@@ -0,0 +1,19 @@
+-- ============================================================
+--  Berechnete Spalte events.beschreibung_kurz
+--  Für EVENTS_SUMMARY_MODE=1: das Frontend selektiert
+--  "beschreibung:beschreibung_kurz" und bekommt nur den Anfang
+--  der Beschreibung über die Leitung (PostgREST computed field).
+-- ============================================================
+
+create or replace function public.beschreibung_kurz(e public.events)
+returns text
+language sql
+stable
+as $$
+  select case
+    when char_length(coalesce(e.beschreibung, '')) <= 400 then e.beschreibung
+    else rtrim(left(e.beschreibung, 400)) || ' …'
+  end
+$$;
+
+grant execute on function public.beschreibung_kurz(public.events) to anon, authenticated;
@@ -0,0 +1,13 @@
+-- ============================================================
+--  events.ics_uid – Herkunft aus einem ICS-Import
+--  Der Import (python events_app.py --import-ics <datei>) schreibt
+--  per upsert on_conflict=ics_uid: erneutes Einlesen derselben
+--  Datei aktualisiert Termine statt sie zu verdoppeln.
+--  Manuell angelegte Termine haben ics_uid = null.
+-- ============================================================
+
+alter table public.events
+  add column if not exists ics_uid text;
+
+create unique index if not exists events_ics_uid_key
+  on public.events (ics_uid);
@@ -0,0 +1,24 @@
+-- ============================================================
+--  events.updated_at – Versionsstempel je Termin
+--  Das Frontend cached gerenderte Karten und .ics-Dateien je
+--  (id, updated_at); ohne die Spalte müsste es jede Zeile
+--  hashen, um Änderungen zu erkennen.
+-- ============================================================
+
+alter table public.events
+  add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.events_touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end
+$$;
+
+drop trigger if exists events_touch_updated_at on public.events;
+create trigger events_touch_updated_at
+  before update on public.events
+  for each row execute function public.events_touch_updated_at();
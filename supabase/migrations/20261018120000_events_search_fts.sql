@@ -0,0 +1,94 @@
+-- ============================================================
+--  Volltextsuche: events.search_tsv + RPC search_events
+--  Ersetzt im Frontend die ILIKE-Kette (6 Spalten je Suchwort)
+--  durch eine GIN-indizierte Suche mit deutscher Konfiguration
+--  (Stemming: "Bürgerdialoge" findet "Bürgerdialog").
+--  Gewichte: titel A, kategorie/ort B, beschreibung C, status/team D.
+--  Das Frontend fällt auf ILIKE zurück, solange die Funktion fehlt.
+-- ============================================================
+
+alter table public.events
+  add column if not exists search_tsv tsvector
+  generated always as (
+    setweight(to_tsvector('german', coalesce(titel, '')), 'A') ||
+    setweight(to_tsvector('german', coalesce(kategorie, '')), 'B') ||
+    setweight(to_tsvector('german', coalesce(ort, '')), 'B') ||
+    setweight(to_tsvector('german', coalesce(beschreibung, '')), 'C') ||
+    setweight(to_tsvector('german', coalesce(status::text, '') || ' ' || coalesce(team::text, '')), 'D')
+  ) stored;
+
+create index if not exists events_search_tsv_idx
+  on public.events using gin (search_tsv);
+
+-- Suchbegriff -> tsquery: jedes Wort als Präfix (Live-Suche: "Stamm" findet
+-- "Stammtisch"), alle Wörter müssen vorkommen (UND, wie bisher).
+-- Jedes Wort wird selbst als tsquery-Literal gequotet (\ und ' escapt) – nicht
+-- quote_literal, das bei Backslash E'...' liefert und in to_tsquery ungültig ist.
+create or replace function public.events_search_query(q text)
+returns tsquery
+language sql
+immutable
+as $$
+  select to_tsquery('german', string_agg(
+    '''' || replace(replace(t, '\', '\\'), '''', '''''') || ''':*', ' & '))
+  from regexp_split_to_table(lower(btrim(coalesce(q, ''))), '\s+') as t
+  where t <> ''
+$$;
+
+-- Eine Ergebnisseite + Gesamtzahl in einer Antwort:
+--   {"total": 42, "rows": [{id, titel, ..., rank}, ...]}
+-- sort: 'datum' (Standard) oder 'relevanz' (ts_rank, bei Gleichstand Datum).
+-- summary: beschreibung gekürzt (wie EVENTS_SUMMARY_MODE / beschreibung_kurz).
+create or replace function public.search_events(
+  q text,
+  start_date date default null,
+  sort text default 'datum',
+  page_limit integer default 6,
+  page_offset integer default 0,
+  summary boolean default false
+)
+returns jsonb
+language sql
+stable
+as $$
+  with query as (
+    select public.events_search_query(q) as tsq
+  ),
+  matches as (
+    select e.id, e.datum, ts_rank(e.search_tsv, query.tsq) as rank
+    from public.events e, query
+    where e.published
+      and e.search_tsv @@ query.tsq
+      and (start_date is null or e.datum >= start_date)
+  ),
+  page as (
+    select m.id, m.rank,
+           row_number() over (order by
+             case when sort = 'relevanz' then m.rank end desc nulls last,
+             m.datum asc nulls last,
+             m.id asc) as pos
+    from matches m
+    order by pos
+    limit greatest(page_limit, 0)
+    offset greatest(page_offset, 0)
+  )
+  select jsonb_build_object(
+    'total', (select count(*) from matches),
+    'rows', coalesce((
+      select jsonb_agg(jsonb_build_object(
+        'id', e.id, 'titel', e.titel, 'datum', e.datum, 'uhrzeit', e.uhrzeit,
+        'dauer', e.dauer, 'ort', e.ort, 'kategorie', e.kategorie,
+        'beschreibung', case when summary then public.beschreibung_kurz(e) else e.beschreibung end,
+        'event_level', e.event_level, 'link', e.link, 'pdf_url', e.pdf_url,
+        'requires_registration', e.requires_registration, 'email_contact', e.email_contact,
+        'show_location', e.show_location, 'email_questions', e.email_questions,
+        'updated_at', e.updated_at, 'rank', p.rank
+      ) order by p.pos)
+      from page p
+      join public.events e on e.id = p.id
+    ), '[]'::jsonb)
+  )
+$$;
+
+grant execute on function public.events_search_query(text) to anon, authenticated;
+grant execute on function public.search_events(text, date, text, integer, integer, boolean) to anon, authenticated;
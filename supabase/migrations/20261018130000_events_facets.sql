@@ -0,0 +1,117 @@
+-- ============================================================
+--  Facetten-Filter: kategorie, ort, team, event_level
+--  - Indizes für exakte Treffer (published + Spalte, sortiert nach datum),
+--    damit ein Facetten-Filter ohne ILIKE-Scan auskommt
+--  - search_events bekommt den Parameter facets (jsonb, {"ort": "Berlin", ...})
+--  - event_facet_counts: Anzahl je Facettenwert in einer Antwort;
+--    das Frontend cacht das Ergebnis (FACET_CACHE_TTL) für alle Besucher
+--  Orte von Events mit show_location = false (auf der Karte verborgen)
+--  erscheinen weder als Facettenwert noch als Treffer des ort-Filters.
+-- ============================================================
+
+create index if not exists events_kategorie_datum_idx
+  on public.events (kategorie, datum, id) where published;
+create index if not exists events_ort_datum_idx
+  on public.events (ort, datum, id) where published and show_location;
+create index if not exists events_team_datum_idx
+  on public.events (team, datum, id) where published;
+create index if not exists events_event_level_datum_idx
+  on public.events (event_level, datum, id) where published;
+
+-- Neue Signatur (zusätzlicher Parameter) -> alte Funktion entfernen, sonst
+-- sind die Aufrufe über PostgREST mehrdeutig.
+drop function if exists public.search_events(text, date, text, integer, integer, boolean);
+
+create or replace function public.search_events(
+  q text,
+  start_date date default null,
+  sort text default 'datum',
+  page_limit integer default 6,
+  page_offset integer default 0,
+  summary boolean default false,
+  facets jsonb default '{}'::jsonb
+)
+returns jsonb
+language sql
+stable
+as $$
+  with query as (
+    select public.events_search_query(q) as tsq
+  ),
+  matches as (
+    select e.id, e.datum, ts_rank(e.search_tsv, query.tsq) as rank
+    from public.events e, query
+    where e.published
+      and e.search_tsv @@ query.tsq
+      and (start_date is null or e.datum >= start_date)
+      and (facets->>'kategorie' is null or e.kategorie = facets->>'kategorie')
+      and (facets->>'ort' is null or (e.ort = facets->>'ort' and e.show_location))
+      and (facets->>'team' is null or e.team::text = facets->>'team')
+      and (facets->>'event_level' is null or e.event_level = facets->>'event_level')
+  ),
+  page as (
+    select m.id, m.rank,
+           row_number() over (order by
+             case when sort = 'relevanz' then m.rank end desc nulls last,
+             m.datum asc nulls last,
+             m.id asc) as pos
+    from matches m
+    order by pos
+    limit greatest(page_limit, 0)
+    offset greatest(page_offset, 0)
+  )
+  select jsonb_build_object(
+    'total', (select count(*) from matches),
+    'rows', coalesce((
+      select jsonb_agg(jsonb_build_object(
+        'id', e.id, 'titel', e.titel, 'datum', e.datum, 'uhrzeit', e.uhrzeit,
+        'dauer', e.dauer, 'ort', e.ort, 'kategorie', e.kategorie,
+        'beschreibung', case when summary then public.beschreibung_kurz(e) else e.beschreibung end,
+        'event_level', e.event_level, 'link', e.link, 'pdf_url', e.pdf_url,
+        'requires_registration', e.requires_registration, 'email_contact', e.email_contact,
+        'show_location', e.show_location, 'email_questions', e.email_questions,
+        'updated_at', e.updated_at, 'rank', p.rank
+      ) order by p.pos)
+      from page p
+      join public.events e on e.id = p.id
+    ), '[]'::jsonb)
+  )
+$$;
+
+-- Facettenwerte mit Anzahl (veröffentlicht, ab start_date), häufigste zuerst:
+--   {"kategorie": [["Stammtisch", 12], ["Infostand", 7]], "ort": [...], ...}
+create or replace function public.event_facet_counts(start_date date default null)
+returns jsonb
+language sql
+stable
+as $$
+  with base as (
+    select kategorie,
+           case when show_location is true then ort end as ort,
+           team::text as team, event_level
+    from public.events
+    where published
+      and (start_date is null or datum >= start_date)
+  ),
+  vals as (
+    select 'kategorie' as facet, kategorie as value from base
+    union all select 'ort', ort from base
+    union all select 'team', team from base
+    union all select 'event_level', event_level from base
+  ),
+  counts as (
+    select facet, value, count(*) as n
+    from vals
+    where btrim(coalesce(value, '')) <> ''
+    group by facet, value
+  )
+  select coalesce(jsonb_object_agg(facet, items), '{}'::jsonb)
+  from (
+    select facet, jsonb_agg(jsonb_build_array(value, n) order by n desc, value) as items
+    from counts
+    group by facet
+  ) f
+$$;
+
+grant execute on function public.search_events(text, date, text, integer, integer, boolean, jsonb) to anon, authenticated;
+grant execute on function public.event_facet_counts(date) to anon, authenticated;
@@ -0,0 +1,134 @@
+"""Benchmark: .ics-Schreiber (bytearray, faltend) gegen den früheren
+join-basierten Builder (Zeilenliste + "\\r\\n".join + encode, ohne Faltung),
+dazu die Zeit-Herleitung (derive_instants_bulk) gegen die ursprüngliche
+derive_times_from_event + to_utc_z je Event.
+
+    python tests/bench_ics_writer.py [ANZAHL_EVENTS]
+
+Referenz-Builder und alte Herleitung sind hier nachgebaut, damit der Vergleich
+ohne alte Modulversion läuft. Der Builder faltet nicht – der Schreiber leistet
+also mehr Arbeit.
+"""
+import random
+import re
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from events_app_ics_helper import (  # noqa: E402
+    _ics_times,
+    build_ics_event,
+    derive_instants_bulk,
+    ics_dtstamp,
+    ics_escape,
+    iter_ics_calendar,
+)
+
+
+def baseline_times(ev: dict) -> tuple[bool, str, str]:
+    """Ursprüngliche Herleitung: ZoneInfo + re.search je Aufruf, ISO-Umweg, strftime.
+    (Liest "1,5 Std" wie früher als 5 h – nur zur Zeitmessung.)"""
+    datum = (ev.get("datum") or "")[:10]
+    uhr = (ev.get("uhrzeit") or "").strip()
+    if not (datum and uhr):
+        return True, datum.replace("-", ""), datum.replace("-", "")
+    try:
+        hh, mm = [int(x) for x in uhr.split(":")[:2]]
+    except Exception:
+        hh, mm = 9, 0
+    start_dt = datetime(int(datum[:4]), int(datum[5:7]), int(datum[8:10]),
+                        hh, mm, tzinfo=ZoneInfo("Europe/Berlin"))
+    dur = (ev.get("dauer") or "").strip().lower()
+    mins = 120
+    m = re.search(r"(\d+)\s*(min|minute|minuten)", dur)
+    h = re.search(r"(\d+)\s*(h|std|stunde|stunden)", dur)
+    if h:
+        mins = int(h.group(1)) * 60
+    elif m:
+        mins = int(m.group(1))
+    end_dt = start_dt + timedelta(minutes=mins)
+
+    def to_utc_z(iso_ts: str) -> str:
+        return datetime.fromisoformat(iso_ts).astimezone(ZoneInfo("UTC")).strftime("%Y%m%dT%H%M%SZ")
+
+    return False, to_utc_z(start_dt.isoformat()), to_utc_z(end_dt.isoformat())
+
+
+def _join_vevent_lines(ev: dict, dtstamp: str, memo: dict | None, times=_ics_times) -> list[str]:
+    all_day, start, end = times(ev) if memo is None else times(ev, memo)
+    param = ";VALUE=DATE" if all_day else ""
+    return [
+        "BEGIN:VEVENT",
+        f"UID:{ev.get('id', 'unknown')}@kalli-events",
+        f"DTSTAMP:{dtstamp}",
+        f"DTSTART{param}:{start}",
+        f"DTEND{param}:{end}",
+        f"SUMMARY:{ics_escape(ev.get('titel') or 'Termin')}",
+        f"LOCATION:{ics_escape(ev.get('ort') or '')}",
+        f"DESCRIPTION:{ics_escape(ev.get('beschreibung') or '')}",
+        f"URL:{ics_escape(ev.get('link') or '')}",
+        "END:VEVENT",
+    ]
+
+
+def join_calendar(events, baseline: bool = False) -> bytes:
+    """baseline=True: mit der ursprünglichen Herleitung (= früherer Export)."""
+    dtstamp, memo = ics_dtstamp(), (None if baseline else {})
+    times = baseline_times if baseline else _ics_times
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Kalli Events//DE",
+             "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    for ev in events:
+        lines += _join_vevent_lines(ev, dtstamp, memo, times)
+    lines += ["END:VCALENDAR", ""]
+    return "\r\n".join(lines).encode("utf-8")
+
+
+def join_single(ev: dict) -> bytes:
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//Kalli Events//DE",
+             "CALSCALE:GREGORIAN", "METHOD:PUBLISH"]
+    lines += _join_vevent_lines(ev, ics_dtstamp(), {}) + ["END:VCALENDAR", ""]
+    return "\r\n".join(lines).encode("utf-8")
+
+
+def sample_events(n: int, seed: int = 7) -> list[dict]:
+    rng = random.Random(seed)
+    words = ["Stammtisch", "Infostand", "Bürgerdialog", "Mitgliederversammlung", "Straße", "Treffpunkt"]
+    return [{
+        "id": i,
+        "titel": " ".join(rng.choices(words, k=rng.randint(1, 4))),
+        "datum": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "uhrzeit": rng.choice(["18:00", "19:00", "19:30"]),
+        "dauer": rng.choice(["90 min", "2 Std", "1,5 Std"]),
+        "ort": rng.choice(["Berlin-Marienfelde", "Gaststätte Zur Linde, Hauptstraße 1"]),
+        "beschreibung": " ".join(rng.choices(words, k=rng.randint(3, 60))),
+        "link": "",
+    } for i in range(n)]
+
+
+def bench(label: str, fn, number: int) -> float:
+    best = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"{label:<34} {best * 1e3:9.3f} ms")
+    return best
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    events = sample_events(n)
+    print(f"{n} Events, bestes von 5 Läufen")
+    a = bench("Herleitung alt (je Event)", lambda: [baseline_times(ev) for ev in events], 3)
+    b = bench("derive_instants_bulk", lambda: derive_instants_bulk(events), 3)
+    print(f"{'Faktor':<34} {a / b:9.2f}x")
+    a = bench("Export alt (join + alte Herleitung)", lambda: join_calendar(events, baseline=True), 3)
+    b = bench("Schreiber iter_ics_calendar", lambda: b"".join(iter_ics_calendar(events)), 3)
+    print(f"{'Faktor':<34} {a / b:9.2f}x")
+    a = bench("join-Builder (ungefaltet)", lambda: join_calendar(events), 3)
+    b = bench("Schreiber iter_ics_calendar", lambda: b"".join(iter_ics_calendar(events)), 3)
+    print(f"{'Faktor':<34} {a / b:9.2f}x")
+    ev = events[0]
+    a = bench("join-Builder, ein Event", lambda: join_single(ev), 2000)
+    b = bench("build_ics_event, ein Event", lambda: build_ics_event(ev), 2000)
+    print(f"{'Faktor':<34} {a / b:9.2f}x")
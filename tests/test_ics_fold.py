@@ -0,0 +1,114 @@
+"""Eigenschaften des .ics-Schreibers (RFC 5545, 3.1) über Zufallsdaten:
+jede physische Zeile <= 75 Oktette, gültiges UTF-8, Entfalten ergibt den
+ungefalteten Inhalt, und der eigene Import liest die Werte unverändert zurück.
+Zufall mit festem Seed – reproduzierbar, ohne Zusatzabhängigkeit.
+"""
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from events_app_ics_helper import (  # noqa: E402
+    _write_line,
+    aiter_ics_calendar,
+    build_ics_event,
+    ics_escape,
+    ics_unescape,
+    iter_ics_calendar,
+    iter_ics_vevents,
+    vevent_to_event,
+)
+
+# ASCII, Umlaute (2 Byte), Gedankenstrich/Euro (3 Byte), Emoji (4 Byte), Escapes
+ALPHABET = list("abcXYZ 019.-_/:") + list("äöüßÄÖÜ") + ["–", "€", "…", "😀", "🗓️"] + [",", ";", "\\", "\n", "\r\n"]
+
+
+def _text(rng: random.Random, max_len: int = 300) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, max_len)))
+
+
+def _event(rng: random.Random, i: int) -> dict:
+    return {
+        "id": i,
+        "titel": _text(rng, 120) or "Termin",
+        "datum": f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "uhrzeit": rng.choice(["", "09:00", "19:30"]),
+        "dauer": rng.choice([None, "90 min", "1,5 Std", "ganztägig"]),
+        "ort": _text(rng, 80),
+        "beschreibung": _text(rng, 600),
+        "link": rng.choice(["", "https://example.org/" + "x" * rng.randint(0, 120)]),
+    }
+
+
+def _unfold(body: bytes) -> bytes:
+    return body.replace(b"\r\n ", b"")
+
+
+def _assert_folded(body: bytes) -> None:
+    assert body.endswith(b"\r\n")
+    lines = body[:-2].split(b"\r\n")
+    for line in lines:
+        assert len(line) <= 75, line
+        line.decode("utf-8")   # nie mitten in einem Zeichen geschnitten
+        assert b"\r" not in line and b"\n" not in line
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_build_ics_event_lines_fit_and_unfold(seed):
+    rng = random.Random(seed)
+    for i in range(25):
+        ev = _event(rng, i)
+        body = build_ics_event(ev)
+        _assert_folded(body)
+        logical = _unfold(body).decode("utf-8").split("\r\n")
+        assert "SUMMARY:" + ics_escape(ev["titel"]) in logical
+        assert "DESCRIPTION:" + ics_escape(ev["beschreibung"]) in logical
+        assert "LOCATION:" + ics_escape(ev["ort"]) in logical
+
+
+@pytest.mark.parametrize("used", [0, 1, 8, 9, 40, 73, 74])
+def test_write_line_every_cut_position(used):
+    # alle Längen rund um die Faltgrenzen, für 1- bis 4-Byte-Zeichen
+    for ch in ("a", "ä", "€", "😀"):
+        for n in range(0, 90):
+            data = (ch * n).encode("utf-8")
+            buf = bytearray(b"P" * used)
+            _write_line(buf, data, used)
+            _assert_folded(bytes(buf))
+            assert _unfold(bytes(buf))[used:-2] == data
+
+
+def test_stream_writers_fold_and_agree():
+    rng = random.Random(1234)
+    events = [_event(rng, i) for i in range(300)]
+    sync_body = b"".join(iter_ics_calendar(events))
+
+    async def collect():
+        async def gen():
+            for ev in events:
+                yield ev
+        return b"".join([c async for c in aiter_ics_calendar(gen())])
+
+    async_body = asyncio.run(collect())
+    _assert_folded(sync_body)
+    strip = lambda b: [l for l in _unfold(b).split(b"\r\n") if not l.startswith(b"DTSTAMP:")]
+    assert strip(sync_body) == strip(async_body)
+    assert sync_body.count(b"BEGIN:VEVENT") == len(events)
+
+
+def test_import_reads_back_written_values(tmp_path):
+    rng = random.Random(99)
+    events = [_event(rng, i) for i in range(200)]
+    path = tmp_path / "export.ics"
+    path.write_bytes(b"".join(iter_ics_calendar(events)))
+    normalize = lambda s: (s or "").replace("\r\n", "\n").replace("\r", "\n")
+    back = list(iter_ics_vevents(path))
+    assert len(back) == len(events)
+    for ev, props in zip(events, back):
+        assert ics_unescape(props["SUMMARY"][1]) == normalize(ev["titel"])
+        assert ics_unescape(props["DESCRIPTION"][1]) == normalize(ev["beschreibung"])
+        assert vevent_to_event(props)["datum"] == ev["datum"]